@@ -0,0 +1,292 @@
+"""
+Batch Granger Causality: every topology/spectral feature against many targets
+
+What it does:
+- Loads feature columns (mean_corr, corr_std, fiedler, h1_loops, h1_persistence) from one
+  or more date-indexed CSVs and targets from stock_returns.csv (raw and absolute returns)
+- For each (feature, target) pair, builds the lagged design [1, y lags, x lags, y] ONCE up
+  to max_lag; lag p then uses its Gram matrix (rows t >= p, added one row at a time as p
+  falls) and a single Cholesky of the [1, y lags, x lags, y] block gives both fits:
+  restricted SSR = unrestricted SSR + the squared x-lag entries of the last Cholesky row
+- Same F test as statsmodels grangercausalitytests (ssr_ftest), i.e. the columns of
+  granger_causality_results.csv: Lag, F_Statistic, P_Value, Significant_0.05
+- Rolling windows: window Gram matrices from cumulative sums of row outer products,
+  one stacked Cholesky per lag over all windows
+- Pairs are spread across processes
+
+Inputs:
+- features_csvs: date-indexed CSVs, e.g. topology_features.csv (Phase 3) and a saved
+  build_feature_matrix(...) frame for mean_corr / corr_std / fiedler
+- returns_csv: stock_returns.csv (Phase 1)
+
+Install:
+pip install numpy pandas scipy
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Tuple, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.stats import f as f_dist
+
+
+# -----------------------------
+# Config
+# -----------------------------
+
+@dataclass
+class Config:
+    features_csvs: Tuple[str, ...] = ("topology_features.csv", "structure_features.csv")
+    features: Tuple[str, ...] = ("mean_corr", "corr_std", "fiedler", "h1_loops", "h1_persistence")
+
+    returns_csv: str = "stock_returns.csv"
+    targets: Optional[List[str]] = None          # None => every column of returns_csv
+    target_transforms: Tuple[str, ...] = ("ret", "abs")
+
+    max_lag: int = 10
+    alpha: float = 0.05
+
+    # rolling windows (None => full sample only)
+    window: Optional[int] = 504
+    step: int = 21
+
+    n_jobs: Optional[int] = None  # None => all cores, 1 => in-process
+
+    out_csv: str = "granger_batch_results.csv"
+    rolling_out_csv: str = "granger_rolling_results.csv"
+
+
+# -----------------------------
+# Data
+# -----------------------------
+
+def load_features(cfg: Config) -> pd.DataFrame:
+    frames = []
+    for path in cfg.features_csvs:
+        if not os.path.exists(path):
+            print(f"Skipping missing features file: {path}")
+            continue
+        frames.append(pd.read_csv(path, index_col=0, parse_dates=True))
+    if not frames:
+        raise RuntimeError("No feature files found.")
+
+    X = pd.concat(frames, axis=1)
+    X = X.loc[:, ~X.columns.duplicated()]
+    missing = [c for c in cfg.features if c not in X.columns]
+    if missing:
+        print(f"Features not found (skipped): {missing}")
+    return X[[c for c in cfg.features if c in X.columns]].sort_index()
+
+
+def load_targets(cfg: Config) -> pd.DataFrame:
+    rets = pd.read_csv(cfg.returns_csv, index_col=0, parse_dates=True).sort_index()
+    cols = list(rets.columns) if cfg.targets is None else cfg.targets
+
+    out = {}
+    for kind in cfg.target_transforms:
+        for c in cols:
+            if kind == "ret":
+                out[c] = rets[c]
+            elif kind == "abs":
+                out[f"|{c}|"] = rets[c].abs()
+            else:
+                raise ValueError(f"Unknown target transform: {kind}")
+    return pd.DataFrame(out)
+
+
+# -----------------------------
+# Shared Lagged Design
+# -----------------------------
+
+def lagged_design(x: np.ndarray, y: np.ndarray, max_lag: int) -> np.ndarray:
+    """
+    (T, 2L + 2) rows [1, y[t-1..t-L], x[t-1..t-L], y[t]]; lags before the sample are 0,
+    which only touches columns that a lag-p fit on rows t >= p never uses.
+    """
+    T, L = len(y), max_lag
+    Z = np.zeros((T, 2 * L + 2))
+    Z[:, 0] = 1.0
+    for j in range(1, L + 1):
+        Z[j:, j] = y[:-j]
+        Z[j:, L + j] = x[:-j]
+    Z[:, -1] = y
+    return Z
+
+
+def _lag_cols(p: int, max_lag: int) -> np.ndarray:
+    """Design columns of the lag-p unrestricted fit, restricted columns first, target last."""
+    L = max_lag
+    return np.r_[0, 1 : p + 1, L + 1 : L + p + 1, 2 * L + 1]
+
+
+def nested_ssr(G: np.ndarray, p: int, max_lag: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Restricted / unrestricted SSR of lag p from Gram matrices G (..., 2L + 2, 2L + 2).
+    With R = chol(Gram of [1, y lags, x lags, y]), SSR of the first j regressors is
+    the sum of squares of R's last row from j on, so one factorization serves both fits.
+    Singular windows (e.g. a constant feature) give NaN.
+    """
+    idx = _lag_cols(p, max_lag)
+    A = G[..., idx[:, None], idx]
+    try:
+        r = np.linalg.cholesky(A)[..., -1, :]
+    except np.linalg.LinAlgError:
+        flat = A.reshape(-1, len(idx), len(idx))
+        r = np.full((len(flat), len(idx)), np.nan)
+        for i, a in enumerate(flat):
+            try:
+                r[i] = np.linalg.cholesky(a)[-1]
+            except np.linalg.LinAlgError:
+                pass
+        r = r.reshape(A.shape[:-1])
+
+    ssr_u = r[..., -1] ** 2
+    ssr_r = ssr_u + (r[..., 1 + p : 1 + 2 * p] ** 2).sum(axis=-1)
+    return ssr_r, ssr_u
+
+
+def f_test(ssr_r: np.ndarray, ssr_u: np.ndarray, p: int, nobs) -> Tuple[np.ndarray, np.ndarray]:
+    df_denom = np.asarray(nobs) - 2 * p - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        F = (ssr_r - ssr_u) / p / (ssr_u / df_denom)
+    return F, f_dist.sf(F, p, df_denom)
+
+
+# -----------------------------
+# Granger Tests
+# -----------------------------
+
+def granger_full(x: np.ndarray, y: np.ndarray, max_lag: int) -> Dict[str, np.ndarray]:
+    """Lags 1..max_lag on the full sample; lag p uses rows t >= p (as statsmodels does)."""
+    L = max_lag
+    Z = lagged_design(x, y, L)
+    G = Z[L:].T @ Z[L:]
+
+    F = np.empty(L)
+    P = np.empty(L)
+    for p in range(L, 0, -1):
+        if p < L:
+            G += np.outer(Z[p], Z[p])
+        ssr_r, ssr_u = nested_ssr(G, p, L)
+        F[p - 1], P[p - 1] = f_test(ssr_r, ssr_u, p, len(y) - p)
+    return {"lag": np.arange(1, L + 1), "F": F, "p": P}
+
+
+def granger_rolling(x: np.ndarray, y: np.ndarray, max_lag: int, window: int, step: int) -> Dict[str, np.ndarray]:
+    """
+    Lags 1..max_lag over windows of `window` rows ending at `end` (exclusive), every `step`
+    rows; every window starts at row >= max_lag so all lags share its rows.
+    Returns F and p with shape (n_windows, max_lag).
+    """
+    L = max_lag
+    Z = lagged_design(x, y, L)
+    ends = np.arange(L + window, len(y) + 1, step)
+    if len(ends) == 0:
+        return {"end": ends, "F": np.empty((0, L)), "p": np.empty((0, L))}
+
+    S = np.zeros((len(Z) + 1, Z.shape[1], Z.shape[1]))
+    np.cumsum(Z[:, :, None] * Z[:, None, :], axis=0, out=S[1:])
+    G = S[ends] - S[ends - window]
+
+    F = np.empty((len(ends), L))
+    P = np.empty((len(ends), L))
+    for p in range(1, L + 1):
+        ssr_r, ssr_u = nested_ssr(G, p, L)
+        F[:, p - 1], P[:, p - 1] = f_test(ssr_r, ssr_u, p, window)
+    return {"end": ends, "F": F, "p": P}
+
+
+_PAIR_DATA: Dict[str, object] = {}
+
+
+def _init_pair_worker(data: Dict[str, object]) -> None:
+    global _PAIR_DATA
+    _PAIR_DATA = data
+
+
+def _standardize(v: np.ndarray) -> np.ndarray:
+    # F is invariant to affine rescaling of x and y; unit scale keeps the Gram well conditioned
+    sd = v.std()
+    return (v - v.mean()) / (sd if sd > 0 else 1.0)
+
+
+def _run_pair(pair: Tuple[str, str], cfg: Config, data: Optional[Dict[str, object]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    data = _PAIR_DATA if data is None else data
+    feat, target = pair
+
+    xy = pd.concat([data["X"][feat], data["Y"][target]], axis=1, keys=["x", "y"]).dropna()
+    x = _standardize(xy["x"].to_numpy(dtype=float))
+    y = _standardize(xy["y"].to_numpy(dtype=float))
+    L = cfg.max_lag
+
+    full = pd.DataFrame()
+    if len(y) > 3 * L + 1:
+        g = granger_full(x, y, L)
+        full = pd.DataFrame({
+            "feature": feat, "target": target, "Lag": g["lag"],
+            "F_Statistic": g["F"], "P_Value": g["p"], f"Significant_{cfg.alpha}": g["p"] < cfg.alpha,
+            "nobs": len(y) - g["lag"],
+        })
+
+    roll = pd.DataFrame()
+    if cfg.window is not None:
+        g = granger_rolling(x, y, L, cfg.window, cfg.step)
+        n = len(g["end"])
+        roll = pd.DataFrame({
+            "feature": feat, "target": target,
+            "date": np.repeat(xy.index[g["end"] - 1], L),
+            "Lag": np.tile(np.arange(1, L + 1), n),
+            "F_Statistic": g["F"].ravel(), "P_Value": g["p"].ravel(),
+        })
+    return full, roll
+
+
+def run_granger_batch(X: pd.DataFrame, Y: pd.DataFrame, cfg: Config) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """All (feature, target) pairs; full-sample and rolling results as long tables."""
+    pairs = [(f, t) for f in X.columns for t in Y.columns]
+    data = {"X": X, "Y": Y}
+
+    if cfg.n_jobs == 1 or len(pairs) == 1:
+        parts = [_run_pair(pr, cfg, data) for pr in pairs]
+    else:
+        chunk = max(1, len(pairs) // (4 * (cfg.n_jobs or os.cpu_count() or 1)))
+        with ProcessPoolExecutor(max_workers=cfg.n_jobs, initializer=_init_pair_worker, initargs=(data,)) as ex:
+            parts = list(ex.map(_run_pair, pairs, [cfg] * len(pairs), chunksize=chunk))
+
+    full = pd.concat([a for a, _ in parts], ignore_index=True)
+    roll = pd.concat([b for _, b in parts], ignore_index=True)
+    return full, roll
+
+
+# -----------------------------
+# Main
+# -----------------------------
+
+if __name__ == "__main__":
+    cfg = Config(
+        features_csvs=("topology_features.csv", "structure_features.csv"),
+        max_lag=10,
+        window=504,
+        step=21,
+    )
+
+    X = load_features(cfg)
+    Y = load_targets(cfg)
+    print(f"{X.shape[1]} features x {Y.shape[1]} targets, lags 1..{cfg.max_lag}")
+
+    full, roll = run_granger_batch(X, Y, cfg)
+
+    sig = full.groupby(["feature", "target"])[f"Significant_{cfg.alpha}"].sum().unstack()
+    print(f"\nSignificant lags (of {cfg.max_lag}) at {cfg.alpha}:")
+    print(sig.to_string())
+
+    full.to_csv(cfg.out_csv, index=False)
+    print(f"\nSaved: {cfg.out_csv}")
+    if len(roll):
+        roll.to_csv(cfg.rolling_out_csv, index=False)
+        print(f"Saved: {cfg.rolling_out_csv}")
@@ -17,10 +17,17 @@ pip install yfinance numpy pandas scipy scikit-learn matplotlib
 
 from __future__ import annotations
 
+import os
+import copy
+import hashlib
+import pickle
+import itertools
 import warnings
 warnings.filterwarnings("ignore")
 
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from functools import partial
 from typing import List, Tuple, Dict, Optional
 
 import numpy as np
@@ -28,12 +35,18 @@ import pandas as pd
 import yfinance as yf
 
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from scipy import sparse
 from scipy.linalg import eigh
+from scipy.sparse.linalg import lobpcg
 
+import sklearn
 from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 
+from price_store import PriceStore, extract_field
+
 
 # -----------------------------
 # Config
@@ -49,8 +62,19 @@ class Config:
     # Try "Adj Close" first, fallback will auto-handle if not present
     price_field: str = "Adj Close"
 
+    # Local price store (None => download everything each run); offline => never hit the network
+    store_dir: Optional[str] = None
+    offline: bool = False
+
     corr_lookback: int = 60
 
+    # Structure-feature graph: "dense" (full eigh; fine for ~10s of names) or, for large universes,
+    # "knn" (each name's graph_k most correlated neighbours) / "threshold" (every pair above graph_threshold)
+    graph: str = "dense"
+    graph_k: int = 10
+    graph_threshold: float = 0.3   # Phase 2 CORRELATION_THRESHOLD
+    n_eigs: int = 1                # sparse modes: Laplacian eigenvalues past the trivial one (> 1 adds lap_eig3, ...)
+
     # Base strategy (momentum)
     momentum_lookback: int = 252  # 12m momentum
     holding_period: int = 21      # rebalance monthly-ish
@@ -73,6 +97,14 @@ class Config:
     max_iter: int = 500
     random_state: int = 42
 
+    # Walk-forward folds run in worker processes (1 => serial, None => all cores)
+    n_jobs: Optional[int] = 1
+    # Start each fold's MLP from the previous fold's weights (folds then run serially)
+    warm_start: bool = False
+    # Content-addressed cache of fitted folds (None => always retrain); oldest entries evicted past the cap
+    cache_dir: Optional[str] = None
+    cache_max_bytes: int = 512 * 2**20
+
 
 # -----------------------------
 # Data Fetching (ROBUST)
@@ -83,29 +115,35 @@ def fetch_prices(cfg: Config) -> pd.DataFrame:
     Robust yfinance download:
     - Handles both MultiIndex and single-level columns
     - Handles cases where 'Adj Close' is missing by falling back to 'Close'
+    - With cfg.store_dir set, serves prices from the local PriceStore after appending
+      only the missing days; cfg.offline=True reads the store without any network access
     """
-    raw = yf.download(
-        cfg.tickers,
-        start=cfg.start,
-        end=cfg.end,
-        progress=False,
-        group_by="column",
-        auto_adjust=False,
-        threads=True,
-    )
-
-    if raw is None or raw.empty:
-        raise RuntimeError("yfinance returned no data. Check tickers/network.")
+    store = PriceStore(cfg.store_dir) if cfg.store_dir is not None else None
+    raw = None
+
+    if store is not None:
+        if not cfg.offline:
+            store.sync(cfg.tickers, cfg.start, cfg.end)
+    elif cfg.offline:
+        raise RuntimeError("offline=True needs cfg.store_dir (no local price store configured).")
+    else:
+        raw = yf.download(
+            cfg.tickers,
+            start=cfg.start,
+            end=cfg.end,
+            progress=False,
+            group_by="column",
+            auto_adjust=False,
+            threads=True,
+        )
+
+        if raw is None or raw.empty:
+            raise RuntimeError("yfinance returned no data. Check tickers/network.")
 
     def extract_field(field: str) -> Optional[pd.DataFrame]:
-        if isinstance(raw.columns, pd.MultiIndex):
-            if field in raw.columns.get_level_values(0):
-                return raw[field].copy()
-            return None
-        else:
-            if field in raw.columns:
-                return raw[field].copy()
-            return None
+        if store is not None:
+            return store.load(field, cfg.tickers, cfg.start, cfg.end)
+        return extract_field(raw, field, cfg.tickers)
 
     df = extract_field(cfg.price_field)
     if df is None:
@@ -118,6 +156,9 @@ def fetch_prices(cfg: Config) -> pd.DataFrame:
     if isinstance(df, pd.Series):
         df = df.to_frame()
 
+    if df.empty:
+        raise RuntimeError("No prices available. Check tickers/network or the local price store.")
+
     # Clean
     df = df.dropna(how="all").ffill().dropna()
     # Sort columns consistently
@@ -133,14 +174,66 @@ def returns_from_prices(px: pd.DataFrame) -> pd.DataFrame:
 # Graph / Topology Proxy Features
 # -----------------------------
 
-def corr_features(window_rets: pd.DataFrame) -> Dict[str, float]:
+def rolling_corr_stack(rets: pd.DataFrame, lookback: int, reseed: int = 252) -> np.ndarray:
+    """
+    Exact rolling correlation matrices, updated one day at a time.
+    Keeps running sums / cross-products (add the new row, drop the old one)
+    instead of calling .corr() on every window.
+
+    Returns C with shape (len(rets) - lookback, N, N) where
+    C[k] == rets.iloc[k : k + lookback].corr(), i.e. the window that
+    build_feature_matrix uses for date rets.index[lookback + k].
+    Sums are re-seeded from scratch every `reseed` steps to stop float drift.
+    """
+    x = rets.to_numpy(dtype=float)
+    if np.isnan(x).any():
+        raise ValueError("rolling_corr_stack expects returns without NaNs (see returns_from_prices).")
+
+    n_obs, n = x.shape
+    m = n_obs - lookback
+    if m <= 0:
+        return np.empty((0, n, n))
+
+    # correlation is shift-invariant; centering keeps the cross-products well conditioned.
+    # Center on the first window so appending new days leaves earlier matrices bit-identical.
+    x = x - x[:lookback].mean(axis=0)
+
+    out = np.empty((m, n, n))
+    s = np.zeros(n)
+    p = np.zeros((n, n))
+    for k in range(m):
+        if k % reseed == 0:
+            w = x[k : k + lookback]
+            s = w.sum(axis=0)
+            p = w.T @ w
+        else:
+            old, new = x[k - 1], x[k + lookback - 1]
+            s += new - old
+            p += np.outer(new, new) - np.outer(old, old)
+
+        cov = p - np.outer(s, s) / lookback
+        sd = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            C = cov / np.outer(sd, sd)
+        C[sd == 0.0, :] = np.nan
+        C[:, sd == 0.0] = np.nan
+        np.fill_diagonal(C, np.where(sd > 0.0, 1.0, np.nan))
+        out[k] = np.clip(C, -1.0, 1.0)
+
+    return out
+
+
+def corr_features(window_rets) -> Dict[str, float]:
     """
     Fast structure features from correlation matrix:
     - mean_corr: mean off-diagonal correlation
     - corr_std: std off-diagonal correlation
     - fiedler: 2nd smallest eigenvalue of normalized Laplacian of W=max(corr,0)
+
+    Accepts a returns window or a precomputed correlation matrix
+    (e.g. one slice of rolling_corr_stack).
     """
-    C = window_rets.corr().values
+    C = window_rets if isinstance(window_rets, np.ndarray) else window_rets.corr().values
     n = C.shape[0]
     if n < 3:
         return {"mean_corr": np.nan, "corr_std": np.nan, "fiedler": np.nan}
@@ -168,17 +261,218 @@ def corr_features(window_rets: pd.DataFrame) -> Dict[str, float]:
     return {"mean_corr": mean_corr, "corr_std": corr_std, "fiedler": fiedler}
 
 
+def corr_features_batch(C: np.ndarray, max_bytes: int = 256 * 2**20) -> Dict[str, np.ndarray]:
+    """
+    Batched corr_features over a stack of correlation matrices (K, N, N).
+    Builds every normalized Laplacian with broadcasting (no np.diag / matmuls)
+    and takes the 2nd smallest eigenvalue from one stacked eigvalsh call per
+    chunk; chunks are sized so each Laplacian block stays under `max_bytes`.
+    """
+    K, n = C.shape[0], C.shape[1]
+    if n < 3:
+        nan = np.full(K, np.nan)
+        return {"mean_corr": nan, "corr_std": nan.copy(), "fiedler": nan.copy()}
+
+    iu = np.triu_indices(n, k=1)
+    off = C[:, iu[0], iu[1]]
+    mean_corr = np.nanmean(off, axis=1)
+    corr_std = np.nanstd(off, axis=1)
+
+    fiedler = np.zeros(K)
+    chunk = max(1, int(max_bytes // (n * n * 8)))
+    for lo in range(0, K, chunk):
+        W = np.clip(C[lo : lo + chunk], 0.0, 1.0)
+        W[:, np.arange(n), np.arange(n)] = 0.0
+        d = W.sum(axis=2)
+
+        # isolates -> fiedler 0 (as in corr_features); NaN correlations -> NaN
+        bad = np.isnan(d).any(axis=1)
+        iso = ~bad & np.any(d <= 1e-12, axis=1)
+        ok = ~(bad | iso)
+
+        f = np.zeros(len(W))
+        f[bad] = np.nan
+        if ok.any():
+            r = 1.0 / np.sqrt(d[ok])
+            L = -(r[:, :, None] * W[ok] * r[:, None, :])
+            L[:, np.arange(n), np.arange(n)] += 1.0
+            f[ok] = np.linalg.eigvalsh(L)[:, 1]
+        fiedler[lo : lo + chunk] = f
+
+    return {"mean_corr": mean_corr, "corr_std": corr_std, "fiedler": fiedler}
+
+
+def _standardized_window(w: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Columns of a (L, N) returns window scaled so Z.T @ Z is their correlation matrix; zero-variance columns flagged."""
+    z = w - w.mean(axis=0)
+    sd = np.sqrt((z * z).sum(axis=0))
+    ok = sd > 0
+    z[:, ok] /= sd[ok]
+    z[:, ~ok] = 0.0
+    return z, ok
+
+
+def corr_moments(Z: np.ndarray) -> Tuple[float, float]:
+    """
+    mean_corr / corr_std (as corr_features) of Z.T @ Z without forming it:
+    sum of all correlations = |Z 1|^2, sum of squares = |Z Z.T|_F^2 (an L x L Gram).
+    """
+    n = Z.shape[1]
+    if n < 3:
+        return np.nan, np.nan
+    pairs = n * (n - 1)
+    s1 = float(np.square(Z.sum(axis=1)).sum()) - n
+    s2 = float(np.square(Z @ Z.T).sum()) - n
+    mean = s1 / pairs
+    return mean, float(np.sqrt(max(s2 / pairs - mean * mean, 0.0)))
+
+
+def knn_graph(Z: np.ndarray, k: int, block: int = 256) -> sparse.csr_matrix:
+    """
+    Sparse kNN correlation graph on the columns of a standardized window Z (L, N):
+    each node keeps its k most correlated neighbours with positive correlation,
+    weights clip(corr, 0, 1) as in corr_features, symmetrized by max(W, W.T).
+    Correlation rows are formed `block` at a time, so memory stays O(N * (k + block)).
+    """
+    n = Z.shape[1]
+    k = min(k, n - 1)
+    rows, cols, vals = [], [], []
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        C = Z[:, lo:hi].T @ Z
+        C[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        nb = np.argpartition(-C, k - 1, axis=1)[:, :k]
+        w = np.take_along_axis(C, nb, axis=1)
+        keep = w > 0.0
+        rows.append(np.repeat(np.arange(lo, hi), k)[keep.ravel()])
+        cols.append(nb[keep])
+        vals.append(np.minimum(w[keep], 1.0))
+
+    A = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    return A.maximum(A.T).tocsr()
+
+
+def threshold_graph(Z: np.ndarray, threshold: float, block: int = 256) -> sparse.csr_matrix:
+    """
+    Sparse threshold graph on the columns of a standardized window Z (L, N): every pair with
+    correlation above `threshold` (and > 0), weights clip(corr, 0, 1) as in corr_features.
+    Rows are formed `block` at a time; memory is O(N * block) plus the edges kept.
+    """
+    n = Z.shape[1]
+    thr = max(threshold, 0.0)
+    rows, cols, vals = [], [], []
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        C = Z[:, lo:hi].T @ Z
+        C[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        i, j = np.nonzero(C > thr)
+        rows.append(i + lo)
+        cols.append(j)
+        vals.append(np.minimum(C[i, j], 1.0))
+
+    return sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+
+def _dense_spectrum(M: np.ndarray, n_eigs: int) -> np.ndarray:
+    """The n_eigs smallest nontrivial eigenvalues 2 - mu of the dense I + D^-1/2 W D^-1/2."""
+    n = M.shape[0]
+    ev = np.linalg.eigvalsh(2.0 * np.eye(n) - M)
+    vals = np.full(n_eigs, np.nan)
+    vals[: n - 1] = ev[1 : 1 + n_eigs]
+    return np.clip(vals, 0.0, 2.0)
+
+
+def sparse_fiedler(W: sparse.csr_matrix, n_eigs: int = 1, X0: Optional[np.ndarray] = None,
+                   tol: float = 1e-6, maxiter: int = 500, dense_max: int = 2000) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    The n_eigs smallest nontrivial eigenvalues of the normalized Laplacian of sparse W (the first is
+    the Fiedler value) by LOBPCG on I + D^-1/2 W D^-1/2 (eigenvalue 2 - lambda, largest end), with
+    the trivial eigenvector D^1/2 1 as a constraint. X0 (N, n_eigs) warm-starts the iteration,
+    e.g. with the previous day's eigenvectors.
+    Isolated nodes => zeros, as in corr_features. If LOBPCG stops short of `tol` it is retried once
+    from a fresh random start with 4x maxiter; if that misses too, graphs of up to dense_max nodes
+    fall back to a dense eigvalsh and larger ones give NaN values. Returns (values, vectors).
+    """
+    n = W.shape[0]
+    d = np.asarray(W.sum(axis=1)).ravel()
+    if np.any(d <= 1e-12):
+        return np.zeros(n_eigs), None
+
+    r = 1.0 / np.sqrt(d)
+    M = sparse.identity(n, format="csr") + sparse.diags(r) @ W @ sparse.diags(r)
+    if n - 1 < 5 * n_eigs:
+        # too small for LOBPCG (it would fall back to a dense solver without constraints)
+        return _dense_spectrum(M.toarray(), n_eigs), None
+
+    y = np.sqrt(d)[:, None] / np.sqrt(d.sum())
+
+    rng = np.random.default_rng(0)
+    for X, iters in ((X0, maxiter), (None, 4 * maxiter)):
+        if X is None or X.shape != (n, n_eigs):
+            X = rng.standard_normal((n, n_eigs))
+        vals, vecs = lobpcg(M, X, Y=y, tol=tol, maxiter=iters, largest=True)
+
+        # lobpcg only warns when it stops at maxiter (and warnings are silenced above): check the residuals
+        resid = np.linalg.norm(M @ vecs - vecs * vals, axis=0)
+        if np.all(np.isfinite(resid)) and resid.max() <= tol * max(1.0, np.abs(vals).max()):
+            order = np.argsort(-vals)
+            return np.clip(2.0 - vals[order], 0.0, 2.0), vecs[:, order]
+
+    # never densify a large graph: that is the N x N matrix this mode exists to avoid
+    if n <= dense_max:
+        return _dense_spectrum(M.toarray(), n_eigs), None
+    return np.full(n_eigs, np.nan), None
+
+
+def sparse_feature_matrix(rets: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    """
+    build_feature_matrix for large universes: same windows, columns and index, but
+    mean_corr / corr_std from window moments and the Fiedler value of a sparse kNN /
+    threshold graph (cfg.graph), warm-started from the previous window's eigenvectors.
+    Per window memory is O(N * graph_k) for knn (O(edges) for threshold) plus the (lookback, N) window.
+    cfg.n_eigs > 1 adds lap_eig3, lap_eig4, ... (next normalized Laplacian eigenvalues).
+    Windows where the eigensolver did not converge are left NaN and counted in a printed note.
+    """
+    x = rets.to_numpy(dtype=float)
+    if np.isnan(x).any():
+        raise ValueError("sparse_feature_matrix expects returns without NaNs (see returns_from_prices).")
+
+    L, n = cfg.corr_lookback, x.shape[1]
+    m = max(len(x) - L, 0)
+    if cfg.graph == "knn":
+        graph = lambda Z: knn_graph(Z, cfg.graph_k)
+    elif cfg.graph == "threshold":
+        graph = lambda Z: threshold_graph(Z, cfg.graph_threshold)
+    else:
+        raise ValueError(f"Unknown graph: {cfg.graph!r} (expected 'dense', 'knn' or 'threshold')")
+    feats = np.full((m, 2 + cfg.n_eigs), np.nan)
+
+    X0, failed = None, 0
+    for k in range(m):
+        Z, ok = _standardized_window(x[k : k + L])
+        feats[k, :2] = corr_moments(Z[:, ok])
+        if n < 3 or not ok.all():
+            continue    # NaN correlations => NaN fiedler, as in corr_features_batch
+        vals, vecs = sparse_fiedler(graph(Z), cfg.n_eigs, X0)
+        feats[k, 2:] = vals
+        failed += int(np.isnan(vals[0]))
+        X0 = vecs if vecs is not None else X0
+    if failed:
+        print(f"sparse_feature_matrix: eigensolver did not converge in {failed} of {m} windows (left NaN)")
+
+    cols = ["mean_corr", "corr_std", "fiedler"] + [f"lap_eig{j + 3}" for j in range(cfg.n_eigs - 1)]
+    return pd.DataFrame(feats, index=pd.Index(rets.index[L:], name="date"), columns=cols)
+
+
 def build_feature_matrix(rets: pd.DataFrame, cfg: Config) -> pd.DataFrame:
-    rows = []
-    idx = []
+    if cfg.graph != "dense":
+        return sparse_feature_matrix(rets, cfg)
 
-    for t in range(cfg.corr_lookback, len(rets)):
-        end = rets.index[t]
-        window = rets.iloc[t - cfg.corr_lookback : t]
-        rows.append(corr_features(window))
-        idx.append(end)
+    # C[k] is the correlation of the lookback window ending the day before idx[k]
+    C = rolling_corr_stack(rets, cfg.corr_lookback)
+    idx = rets.index[cfg.corr_lookback:]
 
-    X = pd.DataFrame(rows, index=pd.Index(idx, name="date"))
+    X = pd.DataFrame(corr_features_batch(C), index=pd.Index(idx, name="date"))
     return X
 
 
@@ -207,30 +501,67 @@ def momentum_scores(px: pd.DataFrame, lookback: int) -> pd.DataFrame:
     return px.pct_change(lookback)
 
 
-def compute_positions_momentum(px: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+def _rank_rows(scores: np.ndarray) -> np.ndarray:
     """
-    Monthly rebalance: long top_n by momentum, equal weight.
-    Held constant between rebalance points via forward-fill.
+    Descending rank (0 = best) of every entry in each row. NaNs rank last and
+    ties go to the earlier column, so the ranking is deterministic.
     """
-    scores = momentum_scores(px, cfg.momentum_lookback)
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    order = np.argsort(-filled, axis=1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(scores.shape[1])[None, :], axis=1)
+    return ranks
+
+
+def momentum_positions_grid(
+    px: pd.DataFrame,
+    top_ns: List[int],
+    holding_periods: List[int],
+    momentum_lookbacks: List[int],
+) -> Dict[Tuple[int, int, int], pd.DataFrame]:
+    """
+    Vectorized momentum rebalance for a whole grid of variants.
+    Returns {(momentum_lookback, holding_period, top_n): daily weights}.
 
-    # Rebalance schedule
-    rebal_dates = px.index[::cfg.holding_period]
-    pos = pd.DataFrame(0.0, index=px.index, columns=px.columns)
+    Per lookback the scores are computed once; per holding period all rebalance
+    rows are ranked at once and that ranking serves every top_n. Daily weights are
+    the latest valid rebalance row expanded by index: names dropped at a rebalance
+    go to 0, a rebalance with fewer than top_n scores keeps the previous book.
+    """
+    T, n = px.shape
+    out = {}
 
-    for d in rebal_dates:
-        if d not in scores.index:
-            continue
-        row = scores.loc[d].dropna()
-        if len(row) < cfg.top_n:
-            continue
-        top = row.sort_values(ascending=False).head(cfg.top_n).index.tolist()
-        w = 1.0 / cfg.top_n
-        pos.loc[d, top] = w
+    for lookback in momentum_lookbacks:
+        scores = momentum_scores(px, lookback).to_numpy(dtype=float)
+
+        for hp in holding_periods:
+            rebal = np.arange(0, T, hp)
+            S = scores[rebal]
+            ranks = _rank_rows(S)
+            n_valid = (~np.isnan(S)).sum(axis=1)
+
+            for top_n in top_ns:
+                ok = n_valid >= top_n
+                W = np.where(ranks < top_n, 1.0 / top_n, 0.0)
 
-    # Forward-fill positions
-    pos = pos.replace(0.0, np.nan).ffill().fillna(0.0)
-    return pos
+                # each day points at the latest rebalance row that was actually traded
+                src = np.full(T, -1)
+                src[rebal[ok]] = np.flatnonzero(ok)
+                src = np.maximum.accumulate(src)
+
+                pos = np.where(src[:, None] >= 0, W[np.maximum(src, 0)], 0.0)
+                out[(lookback, hp, top_n)] = pd.DataFrame(pos, index=px.index, columns=px.columns)
+
+    return out
+
+
+def compute_positions_momentum(px: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    """
+    Monthly rebalance: long top_n by momentum, equal weight.
+    Held constant between rebalance points (assets dropped at a rebalance go to 0).
+    """
+    grid = momentum_positions_grid(px, [cfg.top_n], [cfg.holding_period], [cfg.momentum_lookback])
+    return grid[(cfg.momentum_lookback, cfg.holding_period, cfg.top_n)]
 
 
 # -----------------------------
@@ -275,6 +606,133 @@ def cagr(equity: pd.Series) -> float:
     return float(equity.iloc[-1] ** (1 / years) - 1)
 
 
+def apply_costs_batch(weights: np.ndarray, rets: np.ndarray, cost_bps: float,
+                      dates: Optional[pd.DatetimeIndex] = None) -> Dict[str, np.ndarray]:
+    """
+    apply_costs for K weight variants at once.
+    weights: (K, T, N) (or (T, N)) aligned to rets (T, N); NaN weights / returns count as 0.
+    Returns {"net": (K, T), "turnover": (K, T)} plus batch_metrics of the net returns.
+    """
+    W = np.nan_to_num(np.asarray(weights, dtype=float))
+    if W.ndim == 2:
+        W = W[None]
+    R = np.nan_to_num(np.asarray(rets, dtype=float))
+    K, T, _ = W.shape
+
+    turnover = np.zeros((K, T))
+    gross = np.zeros((K, T))
+    if T > 1:
+        turnover[:, 1:] = np.abs(np.diff(W, axis=1)).sum(axis=2)
+        gross[:, 1:] = np.einsum("ktn,tn->kt", W[:, :-1], R[1:])
+
+    net = gross - (cost_bps / 1e4) * turnover
+    return {"net": net, "turnover": turnover, **batch_metrics(net, dates)}
+
+
+def batch_metrics(net: np.ndarray, dates: Optional[pd.DatetimeIndex] = None) -> Dict[str, np.ndarray]:
+    """
+    sharpe / max_drawdown / cagr for every row of a (K, T) net-return array
+    (same conventions as the scalar functions; cagr needs the T dates),
+    plus annualized vol and win_rate (share of positive days among non-zero days).
+    """
+    K, T = net.shape
+    out = {"sharpe": np.zeros(K), "max_drawdown": np.zeros(K), "cagr": np.zeros(K),
+           "vol": np.zeros(K), "win_rate": np.zeros(K)}
+    if T == 0:
+        return out
+
+    if T >= 2:
+        sd = net.std(axis=1, ddof=1)
+        out["vol"] = np.sqrt(252) * sd
+        if T >= 10:
+            ok = sd != 0
+            out["sharpe"][ok] = np.sqrt(252) * net[ok].mean(axis=1) / sd[ok]
+
+    active = (net != 0).sum(axis=1)
+    out["win_rate"] = np.where(active > 0, (net > 0).sum(axis=1) / np.maximum(active, 1), 0.0)
+
+    eq = np.cumprod(1.0 + net, axis=1)
+    out["max_drawdown"] = (eq / np.maximum.accumulate(eq, axis=1) - 1.0).min(axis=1)
+
+    if dates is None:
+        out["cagr"][:] = np.nan
+    elif T >= 2 and (dates[-1] - dates[0]).days > 0:
+        years = (dates[-1] - dates[0]).days / 365.25
+        out["cagr"] = eq[:, -1] ** (1 / years) - 1
+    return out
+
+
+def _rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing max over `window` columns of a (K, T) array in O(T) (van Herk / Gil-Werman):
+    block prefix maxima and block suffix maxima, one lookup each per position.
+    The first window - 1 columns are NaN.
+    """
+    K, T = x.shape
+    out = np.full((K, T), np.nan)
+    if T < window:
+        return out
+
+    nb = -(-T // window)
+    pad = np.full((K, nb * window), -np.inf)
+    pad[:, :T] = x
+    blocks = pad.reshape(K, nb, window)
+    g = np.maximum.accumulate(blocks, axis=2).reshape(K, -1)
+    h = np.maximum.accumulate(blocks[:, :, ::-1], axis=2)[:, :, ::-1].reshape(K, -1)
+
+    e = np.arange(window - 1, T)
+    out[:, window - 1 :] = np.maximum(h[:, e - window + 1], g[:, e])
+    return out
+
+
+def rolling_metrics(net: np.ndarray, window: int = 252, dates: Optional[pd.DatetimeIndex] = None) -> Dict[str, np.ndarray]:
+    """
+    Trailing-window metrics for every row of a (K, T) net-return array, each (K, T) with
+    NaN for the first window - 1 columns, from cumulative sums (no per-window passes):
+    - sharpe, vol: as r.rolling(window).mean() / .std() (ddof=1), annualized with sqrt(252)
+    - cagr: compounded window return annualized over the window's calendar days
+      (252 days per year without dates)
+    - win_rate: positive days / non-zero days in the window
+    - drawdown: equity vs its peak over the trailing window
+    """
+    net = np.asarray(net, dtype=float)
+    K, T = net.shape
+    w = window
+    out = {k: np.full((K, T), np.nan) for k in ("sharpe", "vol", "cagr", "win_rate", "drawdown")}
+    if T < w or w < 2:
+        return out
+
+    def window_sum(v: np.ndarray) -> np.ndarray:
+        c = np.zeros((K, T + 1))
+        np.cumsum(v, axis=1, out=c[:, 1:])
+        return c[:, w:] - c[:, :-w]
+
+    # centering keeps the sum-of-squares difference well conditioned
+    x = net - net.mean(axis=1, keepdims=True)
+    s, q = window_sum(x), window_sum(x * x)
+    var = np.clip((q - s * s / w) / (w - 1), 0.0, None)
+    sd = np.sqrt(var)
+    mean = s / w + net.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["sharpe"][:, w - 1 :] = np.sqrt(252) * mean / sd
+    out["vol"][:, w - 1 :] = np.sqrt(252) * sd
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.exp(window_sum(np.log1p(net)))
+        if dates is None:
+            years = np.full(T - w + 1, w / 252)
+        else:
+            years = (dates[w - 1 :] - dates[: T - w + 1]).days.to_numpy() / 365.25
+        out["cagr"][:, w - 1 :] = np.where(years > 0, growth ** (1 / np.where(years > 0, years, 1.0)) - 1, 0.0)
+
+        active = window_sum((net != 0).astype(float))
+        out["win_rate"][:, w - 1 :] = np.where(active > 0, window_sum((net > 0).astype(float)) / active, 0.0)
+
+    eq = np.cumprod(1.0 + net, axis=1)
+    out["drawdown"] = eq / _rolling_max(eq, w) - 1.0
+    return out
+
+
 # -----------------------------
 # Walk-forward Splits
 # -----------------------------
@@ -303,109 +761,287 @@ def walk_forward_splits(dates: pd.DatetimeIndex, cfg: Config) -> List[Tuple[pd.T
 
 
 # -----------------------------
-# Main System
+# Fold Artifact Cache
 # -----------------------------
 
-def run_system(cfg: Config) -> Dict[str, object]:
-    px = fetch_prices(cfg)
-    rets = returns_from_prices(px)
+# Config fields that change how/where we run, not what a fold computes
+# Bump when _run_fold or the cached fold artifacts change, so old entries stop matching
+CACHE_VERSION = 1
 
-    # Features
-    X = build_feature_matrix(rets, cfg)
+_CACHE_IGNORE = ("start", "end", "store_dir", "offline", "n_jobs", "cache_dir", "cache_max_bytes", "model_path")
 
-    # Future vol target series (thresholding per fold)
-    future_vol = make_future_vol_series(rets, cfg, benchmark="SPY")
 
-    # Base positions (momentum)
-    base_pos = compute_positions_momentum(px, cfg)
+class ArtifactCache:
+    """
+    Content-addressed pickle store: <root>/<key[:2]>/<key>.pkl.
+    Hits refresh the file mtime; once the directory passes max_bytes the
+    least recently used entries are deleted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".pkl")
+
+    def get(self, key: str) -> Optional[object]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                obj = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated file, or a pickle from other code / library versions: a miss
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        os.utime(path)
+        return obj
+
+    def put(self, key: str, obj: object) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def evict(self) -> None:
+        entries = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".pkl"):
+                    st = os.stat(os.path.join(dirpath, name))
+                    entries.append((st.st_mtime, st.st_size, os.path.join(dirpath, name)))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def fold_keys(cfg: Config, data: Dict[str, object], bounds) -> List[str]:
+    """
+    One cache key per fold: sha256 over CACHE_VERSION, the sklearn / pandas versions, the
+    Config fields that affect training and the fold's train/test slices of every aligned panel.
+    With cfg.warm_start a fold also depends on the previous one, so keys are chained.
+    """
+    fields = {k: v for k, v in asdict(cfg).items() if k not in _CACHE_IGNORE}
+    base = repr((CACHE_VERSION, sklearn.__version__, pd.__version__, sorted(fields.items()))).encode()
+
+    keys, prev = [], ""
+    for (i0, i1, j0, j1) in bounds:
+        h = hashlib.sha256(base)
+        for name in sorted(data):
+            for part in (data[name].iloc[i0:i1], data[name].iloc[j0:j1]):
+                h.update(name.encode())
+                if isinstance(part, pd.DataFrame):
+                    h.update(repr(list(part.columns)).encode())
+                h.update(np.ascontiguousarray(part.index.asi8).tobytes())
+                h.update(np.ascontiguousarray(part.to_numpy(dtype=float)).tobytes())
+        if cfg.warm_start:
+            h.update(prev.encode())
+        prev = h.hexdigest()
+        keys.append(prev)
+    return keys
 
-    # Align indices
-    common = X.index.intersection(future_vol.index).intersection(rets.index).intersection(base_pos.index)
-    X = X.loc[common].dropna()
-    future_vol = future_vol.loc[X.index]
-    rets_aligned = rets.loc[X.index]
-    base_pos_aligned = base_pos.loc[X.index]
 
-    splits = walk_forward_splits(X.index, cfg)
+# -----------------------------
+# Walk-forward fold execution
+# -----------------------------
 
-    all_net_overlay = []
-    all_net_base = []
-    fold_stats = []
+# Aligned panels for the current run; set once per worker by the pool initializer
+_FOLD_DATA: Dict[str, object] = {}
 
-    # diagnostics
-    all_p_risk = []
-    all_exposure_overlay = []
-    all_exposure_base = []
-    all_X_te = []
 
+def _init_fold_worker(data: Dict[str, object]) -> None:
+    global _FOLD_DATA
+    _FOLD_DATA = data
+
+
+def fold_bounds(dates: pd.DatetimeIndex, splits) -> List[Tuple[int, int, int, int]]:
+    """Positional [start, stop) train/test slices for each date split (dates must be sorted)."""
+    bounds = []
     for (tr_s, tr_e, te_s, te_e) in splits:
-        tr_mask = (X.index >= tr_s) & (X.index <= tr_e)
-        te_mask = (X.index >= te_s) & (X.index <= te_e)
+        bounds.append((
+            int(dates.searchsorted(tr_s, side="left")), int(dates.searchsorted(tr_e, side="right")),
+            int(dates.searchsorted(te_s, side="left")), int(dates.searchsorted(te_e, side="right")),
+        ))
+    return bounds
+
+
+def make_model(cfg: Config, prev: Optional[Pipeline] = None) -> Pipeline:
+    """Fresh scaler + MLP pipeline, or with cfg.warm_start a copy of the previous fold's fitted one."""
+    if cfg.warm_start and prev is not None:
+        # scaler refits on the new window; MLP continues from the previous weights
+        model = copy.deepcopy(prev)
+        model.set_params(mlp__warm_start=True)
+        # best loss was measured on the previous window; reset it so early stopping judges this one
+        model.named_steps["mlp"].best_loss_ = np.inf
+        return model
+
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("mlp", MLPClassifier(
+            hidden_layer_sizes=cfg.hidden_layers,
+            activation="relu",
+            alpha=cfg.alpha_l2,
+            max_iter=cfg.max_iter,
+            random_state=cfg.random_state
+        ))
+    ])
+
+
+def _run_fold(cfg: Config, split, bounds, data: Optional[Dict[str, object]] = None,
+              prev_model: Optional[Pipeline] = None) -> Optional[Dict[str, object]]:
+    """Train/score one walk-forward fold; None if the fold is too short."""
+    data = _FOLD_DATA if data is None else data
+    (tr_s, tr_e, te_s, te_e) = split
+    (i0, i1, j0, j1) = bounds
+
+    X = data["X"]
+    X_tr, X_te = X.iloc[i0:i1], X.iloc[j0:j1]
+    vol_tr = data["future_vol"].iloc[i0:i1]
+
+    if len(X_tr) < 200 or len(X_te) < 50:
+        return None
+
+    # TRAIN-only threshold
+    thr = float(np.nanquantile(vol_tr.dropna(), cfg.risk_quantile))
+    y_tr = (vol_tr >= thr).astype(int).fillna(0).values
+
+    # Model
+    model = make_model(cfg, prev_model)
+    model.fit(X_tr.values, y_tr)
+
+    # Predict risk probability on TEST
+    p_risk = pd.Series(model.predict_proba(X_te.values)[:, 1], index=X_te.index, name="p_risk")
+    overlay_scale = (1.0 - p_risk).clip(0.0, 1.0)
+
+    # Positions
+    pos_base = data["base_pos"].iloc[j0:j1].copy()
+    pos_overlay = pos_base.mul(overlay_scale, axis=0)
+
+    # Diagnostics exposures
+    exp_base = pos_base.abs().sum(axis=1).rename("exposure_base")
+    exp_overlay = pos_overlay.abs().sum(axis=1).rename("exposure_overlay")
+
+    # Returns
+    rets_te = data["rets"].iloc[j0:j1]
+    net_base = apply_costs(pos_base, rets_te, cfg.cost_bps).rename("base_ret")
+    net_overlay = apply_costs(pos_overlay, rets_te, cfg.cost_bps).rename("overlay_ret")
+
+    # fold stats (both streams in one columnar pass)
+    m = batch_metrics(np.vstack([net_base.to_numpy(), net_overlay.to_numpy()]))
 
-        X_tr, X_te = X.loc[tr_mask], X.loc[te_mask]
-        vol_tr, vol_te = future_vol.loc[tr_mask], future_vol.loc[te_mask]
+    return {
+        "net_base": net_base,
+        "net_overlay": net_overlay,
+        "p_risk": p_risk,
+        "exp_base": exp_base,
+        "exp_overlay": exp_overlay,
+        "X_te": X_te,
+        "model": model,
+        "thr": thr,
+        "stats": {
+            "test_start": str(te_s.date()),
+            "test_end": str(te_e.date()),
+            "base_sharpe": float(m["sharpe"][0]),
+            "overlay_sharpe": float(m["sharpe"][1]),
+            "base_maxdd": float(m["max_drawdown"][0]),
+            "overlay_maxdd": float(m["max_drawdown"][1]),
+            "avg_p_risk": float(p_risk.mean()),
+            "avg_exp_base": float(exp_base.mean()),
+            "avg_exp_overlay": float(exp_overlay.mean()),
+            "mlp_n_iter": int(model.named_steps["mlp"].n_iter_),
+        },
+    }
 
-        if len(X_tr) < 200 or len(X_te) < 50:
-            continue
 
-        # TRAIN-only threshold
-        thr = float(np.nanquantile(vol_tr.dropna(), cfg.risk_quantile))
-        y_tr = (vol_tr >= thr).astype(int).fillna(0).values
-
-        # Model
-        model = Pipeline([
-            ("scaler", StandardScaler()),
-            ("mlp", MLPClassifier(
-                hidden_layer_sizes=cfg.hidden_layers,
-                activation="relu",
-                alpha=cfg.alpha_l2,
-                max_iter=cfg.max_iter,
-                random_state=cfg.random_state
-            ))
-        ])
-        model.fit(X_tr.values, y_tr)
+def run_folds(cfg: Config, data: Dict[str, object], splits) -> List[Optional[Dict[str, object]]]:
+    """
+    Run every fold, serially or in a process pool (cfg.n_jobs).
+    The aligned panels go to each worker once via the initializer; results come back in split order.
+    With cfg.warm_start each fold starts from the previous fitted model, so the folds run serially.
+    With cfg.cache_dir, folds whose inputs are unchanged are loaded instead of retrained.
+    """
+    bounds = fold_bounds(data["X"].index, splits)
+    cache = ArtifactCache(cfg.cache_dir, cfg.cache_max_bytes) if cfg.cache_dir is not None else None
+    keys = fold_keys(cfg, data, bounds) if cache is not None else [None] * len(splits)
+    results = [cache.get(k) if cache is not None else None for k in keys]
+    todo = [i for i, res in enumerate(results) if res is None]
+
+    if cfg.warm_start:
+        prev = None
+        for i, (sp, bd) in enumerate(zip(splits, bounds)):
+            if results[i] is None:
+                results[i] = _run_fold(cfg, sp, bd, data, prev)
+            if results[i] is not None:
+                prev = results[i]["model"]
+    elif cfg.n_jobs == 1 or len(todo) <= 1:
+        for i in todo:
+            results[i] = _run_fold(cfg, splits[i], bounds[i], data)
+    else:
+        with ProcessPoolExecutor(max_workers=cfg.n_jobs, initializer=_init_fold_worker, initargs=(data,)) as pool:
+            fresh = pool.map(partial(_run_fold, cfg), [splits[i] for i in todo], [bounds[i] for i in todo])
+            for i, res in zip(todo, fresh):
+                results[i] = res
+
+    if cache is not None:
+        for i in todo:
+            if results[i] is not None:
+                cache.put(keys[i], results[i])
+        cache.evict()
+    return results
 
-        # Predict risk probability on TEST
-        p_risk = pd.Series(model.predict_proba(X_te.values)[:, 1], index=X_te.index, name="p_risk")
-        overlay_scale = (1.0 - p_risk).clip(0.0, 1.0)
 
-        # Positions
-        pos_base = base_pos_aligned.loc[X_te.index].copy()
-        pos_overlay = pos_base.mul(overlay_scale, axis=0)
+# -----------------------------
+# Main System
+# -----------------------------
 
-        # Diagnostics exposures
-        exp_base = pos_base.abs().sum(axis=1).rename("exposure_base")
-        exp_overlay = pos_overlay.abs().sum(axis=1).rename("exposure_overlay")
+def align_inputs(X: pd.DataFrame, future_vol: pd.Series, rets: pd.DataFrame, base_pos: pd.DataFrame) -> Dict[str, object]:
+    """Restrict every panel to the dates with complete features (the `data` dict run_folds expects)."""
+    common = X.index.intersection(future_vol.index).intersection(rets.index).intersection(base_pos.index)
+    X = X.loc[common].dropna()
+    return {
+        "X": X,
+        "future_vol": future_vol.loc[X.index],
+        "rets": rets.loc[X.index],
+        "base_pos": base_pos.loc[X.index],
+    }
 
-        # Returns
-        rets_te = rets_aligned.loc[X_te.index]
-        net_base = apply_costs(pos_base, rets_te, cfg.cost_bps).rename("base_ret")
-        net_overlay = apply_costs(pos_overlay, rets_te, cfg.cost_bps).rename("overlay_ret")
 
-        all_net_base.append(net_base)
-        all_net_overlay.append(net_overlay)
+def run_system(cfg: Config) -> Dict[str, object]:
+    px = fetch_prices(cfg)
+    rets = returns_from_prices(px)
 
-        # store diagnostics
-        all_p_risk.append(p_risk)
-        all_exposure_base.append(exp_base)
-        all_exposure_overlay.append(exp_overlay)
-        all_X_te.append(X_te)
+    # Features
+    X = build_feature_matrix(rets, cfg)
 
-        # fold stats
-        eq_base = (1.0 + net_base).cumprod()
-        eq_overlay = (1.0 + net_overlay).cumprod()
+    # Future vol target series (thresholding per fold)
+    future_vol = make_future_vol_series(rets, cfg, benchmark="SPY")
 
-        fold_stats.append({
-            "test_start": str(te_s.date()),
-            "test_end": str(te_e.date()),
-            "base_sharpe": sharpe(net_base),
-            "overlay_sharpe": sharpe(net_overlay),
-            "base_maxdd": max_drawdown(eq_base),
-            "overlay_maxdd": max_drawdown(eq_overlay),
-            "avg_p_risk": float(p_risk.mean()),
-            "avg_exp_base": float(exp_base.mean()),
-            "avg_exp_overlay": float(exp_overlay.mean()),
-        })
+    # Base positions (momentum)
+    base_pos = compute_positions_momentum(px, cfg)
+
+    data = align_inputs(X, future_vol, rets, base_pos)
+    splits = walk_forward_splits(data["X"].index, cfg)
+    folds = [f for f in run_folds(cfg, data, splits) if f is not None]
+
+    all_net_base = [f["net_base"] for f in folds]
+    all_net_overlay = [f["net_overlay"] for f in folds]
+    fold_stats = [f["stats"] for f in folds]
+
+    # diagnostics
+    all_p_risk = [f["p_risk"] for f in folds]
+    all_exposure_base = [f["exp_base"] for f in folds]
+    all_exposure_overlay = [f["exp_overlay"] for f in folds]
+    all_X_te = [f["X_te"] for f in folds]
 
     if not all_net_overlay:
         raise RuntimeError("No valid folds produced. Expand date range or adjust cfg.")
@@ -441,11 +1077,220 @@ def run_system(cfg: Config) -> Dict[str, object]:
     }
 
 
+def compare_warm_start(cfg: Config) -> pd.DataFrame:
+    """Run cold- and warm-start training side by side: iterations, overlay Sharpe and p_risk gap per fold."""
+    cold = run_system(replace(cfg, warm_start=False))
+    warm = run_system(replace(cfg, warm_start=True))
+
+    fc, fw = cold["fold_stats"], warm["fold_stats"]
+    rows = []
+    for (_, c), (_, w) in zip(fc.iterrows(), fw.iterrows()):
+        pc = cold["p_risk"].loc[c["test_start"]:c["test_end"]]
+        pw = warm["p_risk"].loc[w["test_start"]:w["test_end"]]
+        rows.append({
+            "test_start": c["test_start"],
+            "test_end": c["test_end"],
+            "cold_n_iter": c["mlp_n_iter"],
+            "warm_n_iter": w["mlp_n_iter"],
+            "cold_overlay_sharpe": c["overlay_sharpe"],
+            "warm_overlay_sharpe": w["overlay_sharpe"],
+            "p_risk_mae": float((pc - pw).abs().mean()),
+        })
+    return pd.DataFrame(rows)
+
+
+# -----------------------------
+# Hyperparameter Search
+# -----------------------------
+
+# Every candidate setting's aligned panels (key -> data dict); set once per search worker
+_SEARCH_DATA: Dict[tuple, Dict[str, object]] = {}
+
+
+def _init_search_worker(datasets: Dict[tuple, Dict[str, object]]) -> None:
+    global _SEARCH_DATA
+    _SEARCH_DATA = datasets
+
+
+def _search_fold(cfg: Config, key, split, bounds) -> Optional[Dict[str, object]]:
+    return _run_fold(cfg, split, bounds, _SEARCH_DATA[key])
+
+
+def search_configs(
+    base_cfg: Config,
+    space: Dict[str, List[object]],
+    max_candidates: Optional[int] = None,
+    eta: int = 3,
+    min_folds: int = 1,
+    holdout_folds: int = 1,
+    n_jobs: Optional[int] = None,
+    random_state: int = 0,
+) -> pd.DataFrame:
+    """
+    Successive-halving search over Config fields (space: field -> candidate values).
+
+    Every candidate is scored by mean overlay Sharpe on the first `min_folds` walk-forward
+    folds; each rung keeps the best 1/eta and gives the survivors eta times as many folds,
+    until all selection folds are used. The last `holdout_folds` folds never take part in
+    selection and are only scored for the finalists (nested walk-forward).
+    Features / labels / base positions are built once per distinct setting and shared by
+    all candidates; each rung's (candidate, fold) fits run in one process pool.
+    Returns a leaderboard with per-fold overlay Sharpe and max drawdown.
+    """
+    names = sorted(space)
+    grid = [dict(zip(names, vals)) for vals in itertools.product(*(space[n] for n in names))]
+    if max_candidates is not None and max_candidates < len(grid):
+        rng = np.random.default_rng(random_state)
+        grid = [grid[i] for i in sorted(rng.choice(len(grid), max_candidates, replace=False))]
+    # folds are scored independently here, so no warm start / fold cache / nested pools
+    cands = [replace(base_cfg, **params, n_jobs=1, warm_start=False, cache_dir=None) for params in grid]
+
+    px = fetch_prices(base_cfg)
+    rets = returns_from_prices(px)
+
+    feats, vols, poss = {}, {}, {}
+    datasets, fold_index = {}, {}
+    keys = []
+    for c in cands:
+        # every field build_feature_matrix reads
+        fkey = (c.corr_lookback, c.graph, c.graph_k, c.graph_threshold, c.n_eigs)
+        pkey = (c.momentum_lookback, c.holding_period, c.top_n)
+        key = fkey + (c.label_horizon,) + pkey
+        keys.append(key)
+        if key in datasets:
+            continue
+        if fkey not in feats:
+            feats[fkey] = build_feature_matrix(rets, c)
+        if c.label_horizon not in vols:
+            vols[c.label_horizon] = make_future_vol_series(rets, c, benchmark="SPY")
+        if pkey not in poss:
+            poss[pkey] = compute_positions_momentum(px, c)
+        data = align_inputs(feats[fkey], vols[c.label_horizon], rets, poss[pkey])
+        splits = walk_forward_splits(data["X"].index, c)
+        datasets[key] = data
+        fold_index[key] = {sp[2]: (sp, bd) for sp, bd in zip(splits, fold_bounds(data["X"].index, splits))}
+
+    # folds are matched across candidates by test start date
+    test_starts = sorted(set.intersection(*(set(f) for f in fold_index.values())))
+    if len(test_starts) <= holdout_folds:
+        raise RuntimeError("Not enough common walk-forward folds for selection + holdout.")
+    selection, holdout = test_starts[:-holdout_folds], test_starts[-holdout_folds:]
+
+    results = [dict() for _ in cands]  # candidate -> {test_start: fold result or None}
+    pool = None if n_jobs == 1 else ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_search_worker, initargs=(datasets,))
+
+    def evaluate(idx: List[int], starts: List[pd.Timestamp]) -> None:
+        tasks = [(i, t) for i in idx for t in starts if t not in results[i]]
+        args = [(cands[i], keys[i]) + fold_index[keys[i]][t] for i, t in tasks]
+        if pool is None:
+            outs = [_run_fold(c, sp, bd, datasets[k]) for c, k, sp, bd in args]
+        else:
+            outs = pool.map(_search_fold, *zip(*args)) if args else []
+        for (i, t), out in zip(tasks, outs):
+            results[i][t] = out
+
+    def score(i: int, starts: List[pd.Timestamp]) -> float:
+        sh = [results[i][t]["stats"]["overlay_sharpe"] for t in starts if results[i].get(t) is not None]
+        sh = [x for x in sh if np.isfinite(x)]
+        return float(np.mean(sh)) if sh else -np.inf
+
+    alive = list(range(len(cands)))
+    rung_of = [0] * len(cands)
+    budget, rung = max(1, min(min_folds, len(selection))), 0
+    try:
+        while True:
+            evaluate(alive, selection[:budget])
+            for i in alive:
+                rung_of[i] = rung
+            if budget >= len(selection):
+                break
+            alive = sorted(alive, key=lambda i: score(i, selection[:budget]), reverse=True)
+            alive = alive[: max(1, len(alive) // eta)]
+            budget, rung = min(len(selection), budget * eta), rung + 1
+        evaluate(alive, holdout)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    rows = []
+    for i, params in enumerate(grid):
+        seen = [t for t in selection if t in results[i]]
+        row = dict(params)
+        row.update({
+            "rung": rung_of[i],
+            "n_folds": len(seen),
+            "mean_sharpe": score(i, seen),
+            "holdout_sharpe": score(i, holdout) if i in alive else np.nan,
+        })
+        for t in seen + (holdout if i in alive else []):
+            st = results[i][t]["stats"] if results[i][t] is not None else {}
+            row[f"sharpe_{t.date()}"] = st.get("overlay_sharpe", np.nan)
+            row[f"maxdd_{t.date()}"] = st.get("overlay_maxdd", np.nan)
+        rows.append(row)
+
+    board = pd.DataFrame(rows).sort_values(["rung", "mean_sharpe"], ascending=False, kind="mergesort")
+    return board.reset_index(drop=True)
+
+
 # -----------------------------
 # Plotting
 # -----------------------------
 
-def plot_performance(out: Dict[str, object], title: str = "Backtest Performance"):
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of a Largest-Triangle-Three-Buckets downsample of (x, y) to n_out points.
+    Keeps the first and last point and, per bucket, the point spanning the largest
+    triangle with the previous pick and the next bucket's mean (peaks and troughs survive).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)   # n_out - 2 buckets between the ends
+    cnt = np.diff(edges)
+    mx = np.add.reduceat(x[:-1], edges[:-1]) / cnt
+    my = np.add.reduceat(y[:-1], edges[:-1]) / cnt
+    mx = np.r_[mx[1:], x[-1]]
+    my = np.r_[my[1:], y[-1]]
+
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((x[a] - mx[b]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (my[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[b + 1] = a
+    return idx
+
+
+def _thin(s: pd.Series, max_points: Optional[int]) -> pd.Series:
+    """LTTB-downsampled copy of a (NaN-free) series; unchanged if short or max_points is None."""
+    s = s.dropna()
+    if max_points is None or len(s) <= max_points:
+        return s
+    x = s.index.asi8 if isinstance(s.index, pd.DatetimeIndex) else np.arange(len(s))
+    return s.iloc[lttb(x, s.to_numpy(dtype=float), max_points)]
+
+
+def _new_figure(figsize, path: Optional[str]):
+    # saved figures never touch pyplot, so they render headless under any backend
+    return plt.figure(figsize=figsize) if path is None else Figure(figsize=figsize)
+
+
+def _finish_figure(fig, path: Optional[str], dpi: int = 120) -> None:
+    fig.tight_layout()
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path, dpi=dpi)
+
+
+def plot_performance(out: Dict[str, object], title: str = "Backtest Performance",
+                     path: Optional[str] = None, max_points: Optional[int] = None):
+    """path => save to that file (png/svg/... by extension) instead of plt.show(); max_points => LTTB-downsample lines."""
     base = out["base_returns"].dropna()
     overlay = out["overlay_returns"].dropna()
 
@@ -456,17 +1301,18 @@ def plot_performance(out: Dict[str, object], title: str = "Backtest Performance"
     dd_base = eq_base / eq_base.cummax() - 1.0
     dd_overlay = eq_overlay / eq_overlay.cummax() - 1.0
 
-    # Rolling Sharpe
+    # Rolling Sharpe (cumulative-sum windows)
     win = 252
-    def rolling_sharpe(r: pd.Series) -> pd.Series:
-        m = r.rolling(win).mean()
-        s = r.rolling(win).std()
-        return np.sqrt(252) * (m / s)
+    rs_base = pd.Series(rolling_metrics(base.to_numpy()[None], win)["sharpe"][0], index=base.index)
+    rs_overlay = pd.Series(rolling_metrics(overlay.to_numpy()[None], win)["sharpe"][0], index=overlay.index)
 
-    rs_base = rolling_sharpe(base)
-    rs_overlay = rolling_sharpe(overlay)
+    # Downsample lines (full data still feeds the histogram)
+    log_base, log_overlay = _thin(np.log(eq_base), max_points), _thin(np.log(eq_overlay), max_points)
+    eq_base, eq_overlay = _thin(eq_base, max_points), _thin(eq_overlay, max_points)
+    dd_base, dd_overlay = _thin(dd_base, max_points), _thin(dd_overlay, max_points)
+    rs_base, rs_overlay = _thin(rs_base, max_points), _thin(rs_overlay, max_points)
 
-    fig = plt.figure(figsize=(14, 12))
+    fig = _new_figure((14, 12), path)
     fig.suptitle(title)
 
     ax1 = fig.add_subplot(3, 2, 1)
@@ -477,8 +1323,8 @@ def plot_performance(out: Dict[str, object], title: str = "Backtest Performance"
     ax1.legend()
 
     ax2 = fig.add_subplot(3, 2, 2)
-    ax2.plot(eq_base.index, np.log(eq_base.values), label="Base")
-    ax2.plot(eq_overlay.index, np.log(eq_overlay.values), label="Overlay")
+    ax2.plot(log_base.index, log_base.values, label="Base")
+    ax2.plot(log_overlay.index, log_overlay.values, label="Overlay")
     ax2.set_title("Equity (Log)")
     ax2.set_xlabel("Date"); ax2.set_ylabel("log(Equity)")
     ax2.legend()
@@ -507,23 +1353,24 @@ def plot_performance(out: Dict[str, object], title: str = "Backtest Performance"
     ax5.legend()
 
     ax6 = fig.add_subplot(3, 2, 6)
-    ax6.plot((1 + base).cumprod().index, (1 + base).cumprod().values, label="Base")
-    ax6.plot((1 + overlay).cumprod().index, (1 + overlay).cumprod().values, label="Overlay")
+    ax6.plot(eq_base.index, eq_base.values, label="Base")
+    ax6.plot(eq_overlay.index, eq_overlay.values, label="Overlay")
     ax6.set_title("Equity (Redundant Check)")
     ax6.set_xlabel("Date"); ax6.set_ylabel("Equity")
     ax6.legend()
 
-    plt.tight_layout()
-    plt.show()
+    _finish_figure(fig, path)
 
 
-def plot_regime_diagnostics(out: Dict[str, object], title: str = "Regime Diagnostics"):
-    p_risk = out.get("p_risk", pd.Series(dtype=float)).dropna()
-    exp_b = out.get("exposure_base", pd.Series(dtype=float)).dropna()
-    exp_o = out.get("exposure_overlay", pd.Series(dtype=float)).dropna()
+def plot_regime_diagnostics(out: Dict[str, object], title: str = "Regime Diagnostics",
+                            path: Optional[str] = None, max_points: Optional[int] = None):
+    """path / max_points as in plot_performance."""
+    p_risk = _thin(out.get("p_risk", pd.Series(dtype=float)), max_points)
+    exp_b = _thin(out.get("exposure_base", pd.Series(dtype=float)), max_points)
+    exp_o = _thin(out.get("exposure_overlay", pd.Series(dtype=float)), max_points)
     X = out.get("features", pd.DataFrame()).dropna()
 
-    fig = plt.figure(figsize=(14, 10))
+    fig = _new_figure((14, 10), path)
     fig.suptitle(title)
 
     ax1 = fig.add_subplot(3, 1, 1)
@@ -546,13 +1393,36 @@ def plot_regime_diagnostics(out: Dict[str, object], title: str = "Regime Diagnos
     if isinstance(X, pd.DataFrame) and len(X) > 0:
         for col in ["mean_corr", "corr_std", "fiedler"]:
             if col in X.columns:
-                ax3.plot(X.index, X[col].values, label=col)
+                f = _thin(X[col], max_points)
+                ax3.plot(f.index, f.values, label=col)
         ax3.legend()
     ax3.set_title("Structure Features Over Time")
     ax3.set_xlabel("Date"); ax3.set_ylabel("Value")
 
-    plt.tight_layout()
-    plt.show()
+    _finish_figure(fig, path)
+
+
+def _render_job(job) -> str:
+    plot_fn, out, title, path, max_points = job
+    plot_fn(out, title, path=path, max_points=max_points)
+    return path
+
+
+def render_reports(jobs: List[Tuple[object, Dict[str, object], str, str]], n_jobs: Optional[int] = None,
+                   max_points: Optional[int] = 2000) -> List[str]:
+    """
+    Headless batch rendering: jobs are (plot_fn, out, title, path) for plot_performance /
+    plot_regime_diagnostics, one figure file each, spread over processes (n_jobs=1 => in-process).
+    Returns the written paths.
+    """
+    for *_, path in jobs:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tasks = [(fn, out, title, path, max_points) for fn, out, title, path in jobs]
+
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [_render_job(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=n_jobs) as ex:
+        return list(ex.map(_render_job, tasks))
 
 
 # -----------------------------
@@ -579,6 +1449,19 @@ if __name__ == "__main__":
         random_state=42,
     )
 
+    # Set True to search the overlay hyperparameters (successive halving on all cores) first
+    run_search = False
+    if run_search:
+        board = search_configs(cfg, {
+            "hidden_layers": [(8,), (16, 16), (32, 16)],
+            "alpha_l2": [1e-4, 1e-3, 1e-2],
+            "risk_quantile": [0.70, 0.75, 0.80],
+            "corr_lookback": [40, 60, 90],
+            "label_horizon": [10, 21],
+        }, max_candidates=54)
+        print("\n=== Search leaderboard ===")
+        print(board.head(10).to_string(index=False))
+
     out = run_system(cfg)
 
     print("\n=== Overall Summary ===")
@@ -594,5 +1477,20 @@ if __name__ == "__main__":
         print("\n=== Fold-by-fold stats ===")
         print(fs.to_string(index=False))
 
-    plot_performance(out, "Base vs Topology+NN Overlay (Momentum Base)")
-    plot_regime_diagnostics(out, "NN Risk + Exposure + Structure Features")
\ No newline at end of file
+    # Set True to rerun with cold- vs warm-start training and compare out-of-sample, fold by fold
+    compare_training = False
+    if compare_training:
+        print("\n=== Cold vs warm-start training ===")
+        print(compare_warm_start(cfg).to_string(index=False))
+
+    # Set a directory to write PNG/SVG figures headless (downsampled, parallel) instead of showing them
+    report_dir = None
+    if report_dir is None:
+        plot_performance(out, "Base vs Topology+NN Overlay (Momentum Base)")
+        plot_regime_diagnostics(out, "NN Risk + Exposure + Structure Features")
+    else:
+        paths = render_reports([
+            (plot_performance, out, "Base vs Topology+NN Overlay (Momentum Base)", os.path.join(report_dir, "performance.png")),
+            (plot_regime_diagnostics, out, "NN Risk + Exposure + Structure Features", os.path.join(report_dir, "regime_diagnostics.png")),
+        ])
+        print("\nSaved: " + ", ".join(paths))
\ No newline at end of file
@@ -1,8 +1,13 @@
+import os
+import time
+
 import pandas as pd
 import numpy as np
 import yfinance as yf
 import matplotlib.pyplot as plt
 
+from price_store import PriceStore, extract_field
+
 # ----------------------------
 # Earnings from yfinance
 # ----------------------------
@@ -17,18 +22,60 @@ def get_earnings_dates_yf(ticker: str) -> pd.DatetimeIndex:
         pass
     return pd.DatetimeIndex([])
 
-def any_in_window(dates: pd.DatetimeIndex, earn_dates_by_ticker: dict, lookahead_days: int) -> pd.Series:
-    out = pd.Series(False, index=dates)
-    for _, ed in earn_dates_by_ticker.items():
+def get_earnings_dates_cached(ticker: str, cache_dir: str = ".earnings_cache", ttl_days: float = 7.0) -> pd.DatetimeIndex:
+    """
+    get_earnings_dates_yf behind a local per-ticker CSV cache that expires after ttl_days.
+    Empty results (usually a Yahoo hiccup) are not cached so they get retried next run.
+    """
+    path = os.path.join(cache_dir, f"{ticker}.csv")
+    if os.path.exists(path) and (time.time() - os.path.getmtime(path)) < ttl_days * 86400:
+        cached = pd.read_csv(path, parse_dates=["earnings_date"])["earnings_date"]
+        return pd.DatetimeIndex(cached)
+
+    ed = get_earnings_dates_yf(ticker)
+    if len(ed):
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        pd.DataFrame({"earnings_date": ed}).to_csv(tmp, index=False)
+        os.replace(tmp, path)
+    return ed
+
+def earnings_window_index(dates: pd.DatetimeIndex, earn_dates_by_ticker: dict, lookahead_days: int) -> dict:
+    """
+    Next-earnings lookup for every (date, ticker): one binary search per ticker over its
+    sorted earnings dates (np.searchsorted on all dates at once) instead of a scan per date.
+
+    Returns dict with
+      days_to_event: DataFrame (dates x tickers), whole days until the next earnings date
+                     on/after each date (NaN when none is scheduled)
+      in_window:     DataFrame of bools, days_to_event <= lookahead_days
+      count:         Series, number of tickers with earnings inside the window per date
+    """
+    d = pd.DatetimeIndex(dates).values.astype("datetime64[ns]")
+    tickers = list(earn_dates_by_ticker)
+    days = np.full((len(d), len(tickers)), np.nan)
+
+    for j, t in enumerate(tickers):
+        ed = np.sort(pd.DatetimeIndex(earn_dates_by_ticker[t]).values.astype("datetime64[ns]"))
         if len(ed) == 0:
             continue
-        ed = pd.DatetimeIndex(ed)
-        # vector-ish approach: for each date, find next earnings by scanning (ok for our scale)
-        for d in dates:
-            future = ed[ed >= d]
-            if len(future) and (future[0] - d).days <= lookahead_days:
-                out.loc[d] = True
-    return out
+        pos = np.searchsorted(ed, d, side="left")   # first earnings date >= d
+        has = pos < len(ed)
+        nxt = ed[np.minimum(pos, len(ed) - 1)]
+        delta = (nxt - d) // np.timedelta64(1, "D")
+        days[has, j] = delta[has]
+
+    days_to_event = pd.DataFrame(days, index=dates, columns=tickers)
+    in_window = days_to_event <= lookahead_days
+    return {
+        "days_to_event": days_to_event,
+        "in_window": in_window,
+        "count": in_window.sum(axis=1).rename("n_in_window"),
+    }
+
+def any_in_window(dates: pd.DatetimeIndex, earn_dates_by_ticker: dict, lookahead_days: int) -> pd.Series:
+    idx = earnings_window_index(dates, earn_dates_by_ticker, lookahead_days)
+    return (idx["count"] > 0).rename(None)
 
 # ----------------------------
 # USER SETTINGS (APPAREL ONLY)
@@ -36,6 +83,10 @@ def any_in_window(dates: pd.DatetimeIndex, earn_dates_by_ticker: dict, lookahead
 START = "2015-01-01"
 END   = None
 
+# Local price store (None => download every run); OFFLINE => read the store only
+PRICE_STORE_DIR = None
+OFFLINE = False
+
 # Keep apparel-only; avoid tickers that Yahoo breaks for you
 MALL_HEAVY = ["AEO","ANF","URBN"]
 RESILIENT  = ["LEVI","RL","COLM","KTB","VFC","PVH","HBI"]
@@ -48,24 +99,35 @@ COST_BPS = 2.0
 # ----------------------------
 # Helpers
 # ----------------------------
-def fetch_prices_robust(tickers, start, end=None):
+def fetch_prices_robust(tickers, start, end=None, store_dir=None, offline=False):
     """
     Downloads prices and drops tickers that failed (all-NaN).
+    With store_dir, prices come from the local PriceStore (only missing days are
+    downloaded; offline=True never touches the network).
     Returns (prices_df, kept_tickers, dropped_tickers)
     """
-    raw = yf.download(tickers, start=start, end=end, progress=False, auto_adjust=False, group_by="column")
+    if store_dir is not None:
+        store = PriceStore(store_dir)
+        if not offline:
+            store.sync(tickers, start, end)
+        px = store.load("Adj Close", tickers, start, end)
+        if px is None:
+            px = store.load("Close", tickers, start, end)
+        if px is None or px.empty:
+            return pd.DataFrame(), [], tickers
+        px = px.reindex(columns=tickers)
+    else:
+        if offline:
+            raise RuntimeError("offline=True needs store_dir (no local price store configured).")
+        raw = yf.download(tickers, start=start, end=end, progress=False, auto_adjust=False, group_by="column")
 
-    if raw is None or raw.empty:
-        return pd.DataFrame(), [], tickers
+        if raw is None or raw.empty:
+            return pd.DataFrame(), [], tickers
 
-    # extract price panel
-    if isinstance(raw.columns, pd.MultiIndex):
-        if "Adj Close" in raw.columns.get_level_values(0):
-            px = raw["Adj Close"].copy()
-        else:
-            px = raw["Close"].copy()
-    else:
-        px = raw["Adj Close"].to_frame() if "Adj Close" in raw.columns else raw["Close"].to_frame()
+        # extract price panel
+        px = extract_field(raw, "Adj Close", tickers)
+        if px is None:
+            px = extract_field(raw, "Close", tickers)
 
     # Identify tickers that are entirely missing
     kept = [c for c in px.columns if not px[c].dropna().empty]
@@ -99,7 +161,7 @@ def maxdd(eq):
 # ----------------------------
 def run():
     universe = sorted(set(MALL_HEAVY + RESILIENT + ["XRT"]))
-    px, kept, dropped = fetch_prices_robust(universe, START, END)
+    px, kept, dropped = fetch_prices_robust(universe, START, END, store_dir=PRICE_STORE_DIR, offline=OFFLINE)
 
     print("Kept tickers:", kept)
     if dropped:
@@ -126,7 +188,7 @@ def run():
     shock = shock.reindex(rets.index).fillna(0.0)
 
     # Earnings window: ANY ticker in either basket has earnings soon
-    earn_dates = {t: get_earnings_dates_yf(t) for t in (mall + res)}
+    earn_dates = {t: get_earnings_dates_cached(t) for t in (mall + res)}
     earn_window = any_in_window(rets.index, earn_dates, ENTRY_LOOKAHEAD_DAYS)
 
     shock_event = (shock.abs() >= SHOCK_ENTRY_Z)
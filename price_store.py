@@ -0,0 +1,200 @@
+"""
+Local columnar price store shared by the overlay scripts
+("work of god.py", "import matplotlib.py", "intresting weather.py")
+
+What it does:
+- One directory per field ("Adj Close", "Close"), each holding versioned snapshots
+  v<N>/ with values.npy (dates x tickers, Fortran order so every ticker column is
+  contiguous), dates.npy (int64 ns) and tickers.json
+- CURRENT names the live version; a write builds the next version in full, renames
+  its directory into place and only then swaps CURRENT, so an interrupted update
+  leaves the previous panel intact and readers never see mixed files
+- Panels are read memory-mapped; old versions are removed best-effort (a reader
+  may still have one mapped, e.g. on Windows)
+- sync() only downloads the days / tickers that are not on disk yet
+
+Install:
+pip install numpy pandas yfinance
+"""
+
+from __future__ import annotations
+
+import os
+import json
+import shutil
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+
+def extract_field(raw: pd.DataFrame, field: str, tickers: List[str]) -> Optional[pd.DataFrame]:
+    """One price field from a yf.download frame (MultiIndex or single-level columns)."""
+    if isinstance(raw.columns, pd.MultiIndex):
+        if field in raw.columns.get_level_values(0):
+            return raw[field].copy()
+        return None
+    if field in raw.columns:
+        df = raw[field].copy()
+        # single-ticker downloads come back as one flat column
+        return df.to_frame(name=tickers[0]) if isinstance(df, pd.Series) else df
+    return None
+
+
+class PriceStore:
+    """
+    Versioned columnar price panels under `root`, one directory per field.
+    load() memory-maps the current version; write() publishes a new one atomically.
+    """
+
+    FIELDS = ("Adj Close", "Close")
+    ADJUST_TOL = 1e-6  # relative move of a stored price on re-download that counts as a re-basing
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _dir(self, field: str) -> str:
+        return os.path.join(self.root, field.replace(" ", "_"))
+
+    def _version(self, field: str) -> Optional[int]:
+        path = os.path.join(self._dir(field), "CURRENT")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return int(json.load(f)["version"])
+
+    def has(self, field: str) -> bool:
+        return self._version(field) is not None
+
+    def load(self, field: str, tickers: Optional[List[str]] = None,
+             start: Optional[str] = None, end: Optional[str] = None,
+             mmap: bool = True) -> Optional[pd.DataFrame]:
+        """
+        Panel for [start, end) (None if field not stored): a slice of the memory-mapped
+        current version, or an in-memory copy with mmap=False.
+        """
+        version = self._version(field)
+        if version is None:
+            return None
+        d = os.path.join(self._dir(field), f"v{version}")
+        values = np.load(os.path.join(d, "values.npy"), mmap_mode="r" if mmap else None)
+        dates = pd.DatetimeIndex(np.load(os.path.join(d, "dates.npy")))
+        with open(os.path.join(d, "tickers.json")) as f:
+            stored = json.load(f)
+
+        lo = 0 if start is None else dates.searchsorted(pd.Timestamp(start))
+        hi = len(dates) if end is None else dates.searchsorted(pd.Timestamp(end))
+
+        cols = stored if tickers is None else [t for t in stored if t in set(tickers)]
+        if cols == stored:
+            block = values[lo:hi]  # no copy: contiguous row slice of the memmap
+        else:
+            block = values[lo:hi][:, [stored.index(t) for t in cols]]
+        return pd.DataFrame(block, index=pd.Index(dates[lo:hi], name="Date"), columns=cols, copy=False)
+
+    def write(self, field: str, panel: pd.DataFrame) -> None:
+        """Publish `panel` as the field's next version (all files, then one CURRENT swap)."""
+        d = self._dir(field)
+        os.makedirs(d, exist_ok=True)
+        panel = panel.sort_index()
+
+        # next number past anything on disk, so a version left by an interrupted write is never reused
+        versions = [int(n[1:]) for n in os.listdir(d) if n.startswith("v") and n[1:].isdigit()]
+        version = max(versions + [self._version(field) or 0]) + 1
+
+        tmp = os.path.join(d, f"v{version}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "values.npy"), np.asfortranarray(panel.to_numpy(dtype=float)))
+        np.save(os.path.join(tmp, "dates.npy"), panel.index.values.astype("datetime64[ns]").astype(np.int64))
+        with open(os.path.join(tmp, "tickers.json"), "w") as f:
+            json.dump([str(c) for c in panel.columns], f)
+        os.rename(tmp, os.path.join(d, f"v{version}"))
+
+        with open(os.path.join(d, "CURRENT.tmp"), "w") as f:
+            json.dump({"version": version}, f)
+        os.replace(os.path.join(d, "CURRENT.tmp"), os.path.join(d, "CURRENT"))
+
+        for n in os.listdir(d):
+            if n.startswith("v") and n != f"v{version}":
+                shutil.rmtree(os.path.join(d, n), ignore_errors=True)
+
+    def sync(self, tickers: List[str], start: str, end: Optional[str] = None) -> None:
+        """
+        Append only what is missing on disk: new tickers (full history) and days outside the stored range.
+        Each append also re-downloads the stored edge day: a split / dividend since the last sync moves
+        Yahoo's whole adjusted history, so a changed edge price rescales that ticker's stored column
+        (or refetches it in full when the day can't be compared) instead of leaving a fake return at the join.
+        Panels are read into memory here (mmap=False), so no mapped file is held open while write() runs.
+        """
+        current = self.load("Close", mmap=False)
+        stored = [] if current is None else list(current.columns)
+        new_tickers = [t for t in tickers if t not in stored]
+        old_tickers = [t for t in tickers if t in stored]
+
+        requests = []  # (tickers, start, end, stored day to check or None)
+        if new_tickers:
+            requests.append((new_tickers, start, end, None))
+        if old_tickers and len(current):
+            first, last = current.index[0], current.index[-1]
+            stop = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end)
+            if last + pd.Timedelta(days=1) < stop:
+                requests.append((old_tickers, str(last.date()), end, last))
+            if pd.Timestamp(start) < first:
+                requests.append((old_tickers, start, str((first + pd.Timedelta(days=1)).date()), first))
+        del current
+
+        refetch = set()
+        for req_tickers, req_start, req_end, anchor in requests:
+            raw = yf.download(req_tickers, start=req_start, end=req_end, progress=False,
+                              group_by="column", auto_adjust=False, threads=True)
+            if raw is None or raw.empty:
+                continue
+            for field in self.FIELDS:
+                new = extract_field(raw, field, req_tickers)
+                if new is None:
+                    continue
+                old = self.load(field, mmap=False)
+                if old is None:
+                    merged = new
+                else:
+                    if anchor is not None:
+                        refetch |= self._rebase(old, new, anchor)
+                    merged = new.combine_first(old)
+                self.write(field, merged.reindex(sorted(merged.columns), axis=1))
+
+        if refetch:
+            req_tickers = sorted(refetch)
+            raw = yf.download(req_tickers, start=start, end=end, progress=False,
+                              group_by="column", auto_adjust=False, threads=True)
+            if raw is None or raw.empty:
+                return
+            for field in self.FIELDS:
+                new = extract_field(raw, field, req_tickers)
+                old = self.load(field, mmap=False)
+                if new is None or old is None:
+                    continue
+                new = new.dropna(axis=1, how="all")
+                merged = new.combine_first(old.drop(columns=[c for c in new.columns if c in old.columns]))
+                self.write(field, merged.reindex(sorted(merged.columns), axis=1))
+
+    def _rebase(self, old: pd.DataFrame, new: pd.DataFrame, anchor: pd.Timestamp) -> set:
+        """
+        Rescale (in place) the stored columns whose `anchor` price differs in the fresh download;
+        Yahoo's adjustments are multiplicative back through history, so one ratio fixes the column.
+        Returns the tickers that have stored data but no comparable price on `anchor`.
+        """
+        unmatched = set()
+        for t in new.columns:
+            if t not in old.columns:
+                continue
+            a = old.at[anchor, t]
+            b = new.at[anchor, t] if anchor in new.index else np.nan
+            if np.isfinite(a) and np.isfinite(b) and a > 0 and b > 0:
+                ratio = b / a
+                if abs(ratio - 1.0) > self.ADJUST_TOL:
+                    old[t] *= ratio
+            elif old[t].notna().any():
+                unmatched.add(t)
+        return unmatched
@@ -0,0 +1,224 @@
+"""
+Random-Entry Monte Carlo Baseline for Event Backtests (e.g. topology-triggered VXX entries)
+
+What it does:
+- Downloads ETF prices via yfinance
+- Event stats per ETF / hold length: n, mean, median, win_rate, std, profit_factor,
+  final_multiple (compounded), max_drawdown of the trade-by-trade equity
+- Random baseline: many draws of the same number of entry dates (uniform, without
+  replacement), scored with array ops; draws are split into fixed-size blocks with
+  SeedSequence children, so results are identical for any number of worker processes
+- Writes the columns of etf_backtest_VXX_topology.csv
+  (rand_mean_avg / p95 / p05, rand_final_avg / p95)
+
+Inputs:
+- events_csv: one event date per row in a "date" column; entry at that day's close
+  (or the next trading day), exit `hold_days` closes later
+
+Install:
+pip install yfinance numpy pandas
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Tuple, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+
+# -----------------------------
+# Config
+# -----------------------------
+
+@dataclass
+class Config:
+    tickers: List[str]
+
+    start: str = "2018-01-01"
+    end: Optional[str] = None
+
+    hold_days: Tuple[int, ...] = (1, 2, 3, 5)
+
+    # Monte Carlo
+    n_draws: int = 100_000
+    block_size: int = 5_000      # draws per task; fixed so seeding doesn't depend on n_jobs
+    seed: int = 7
+    n_jobs: Optional[int] = None  # None => all cores, 1 => in-process
+
+    events_csv: str = "topology_events.csv"
+    out_csv: str = "etf_backtest_VXX_topology.csv"
+
+
+# -----------------------------
+# Data
+# -----------------------------
+
+def fetch_closes(cfg: Config) -> pd.DataFrame:
+    raw = yf.download(cfg.tickers, start=cfg.start, end=cfg.end, progress=False, auto_adjust=False, group_by="column")
+    if raw is None or raw.empty:
+        raise RuntimeError("yfinance returned no data. Check tickers/network.")
+
+    field = "Adj Close" if "Adj Close" in raw.columns.get_level_values(0) else "Close"
+    px = raw[field]
+    if isinstance(px, pd.Series):
+        px = px.to_frame(name=cfg.tickers[0])
+    return px.dropna(how="all")
+
+
+def load_events(path: str) -> pd.DatetimeIndex:
+    ev = pd.read_csv(path, parse_dates=["date"])
+    return pd.DatetimeIndex(ev["date"]).sort_values()
+
+
+def forward_returns(px: pd.Series, hold_days: Tuple[int, ...]) -> np.ndarray:
+    """(H, T) close-to-close returns from day t to t + h; NaN where the exit is past the data."""
+    p = px.to_numpy(dtype=float)
+    fwd = np.full((len(hold_days), len(p)), np.nan)
+    for i, h in enumerate(hold_days):
+        fwd[i, : len(p) - h] = p[h:] / p[:-h] - 1.0
+    return fwd
+
+
+# -----------------------------
+# Event Stats
+# -----------------------------
+
+def event_stats(r: np.ndarray) -> Dict[str, float]:
+    """Trade-level stats for event returns in date order."""
+    r = r[np.isfinite(r)]
+    if len(r) == 0:
+        return {"n": 0}
+    eq = np.cumprod(1.0 + r)
+    peak = np.maximum.accumulate(np.r_[1.0, eq])[1:]
+    losses = -r[r < 0].sum()
+    return {
+        "n": len(r),
+        "mean": float(r.mean()),
+        "median": float(np.median(r)),
+        "win_rate": float((r > 0).mean()),
+        "std": float(r.std(ddof=1)) if len(r) > 1 else np.nan,
+        "profit_factor": float(r[r > 0].sum() / losses) if losses > 0 else np.inf,
+        "final_multiple": float(eq[-1]),
+        "max_drawdown": float((eq / peak - 1.0).min()),
+    }
+
+
+# -----------------------------
+# Random-Entry Monte Carlo
+# -----------------------------
+
+def sample_without_replacement(rng: np.random.Generator, n_pool: int, n: int, draws: int) -> np.ndarray:
+    """
+    (draws, n) index sets, each uniform without replacement. Sparse case (n << sqrt(n_pool)):
+    draw with replacement and redraw rows with repeats; dense case: n smallest of random keys.
+    """
+    if n * (n - 1) > n_pool:
+        return np.argpartition(rng.random((draws, n_pool)), n - 1, axis=1)[:, :n]
+
+    idx = rng.integers(0, n_pool, size=(draws, n))
+    while True:
+        s = np.sort(idx, axis=1)
+        dup = (np.diff(s, axis=1) == 0).any(axis=1)
+        if not dup.any():
+            return idx
+        idx[dup] = rng.integers(0, n_pool, size=(int(dup.sum()), n))
+
+
+def _random_block(fwd: np.ndarray, pool: np.ndarray, n_events: Tuple[int, ...], draws: int,
+                  seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and compounded final multiple of `draws` random entry sets, for every hold length."""
+    rng = np.random.default_rng(seed)
+    n_max = max(n_events)
+    idx = pool[sample_without_replacement(rng, len(pool), n_max, draws)]
+
+    means = np.empty((len(fwd), draws))
+    finals = np.empty((len(fwd), draws))
+    for h, n in enumerate(n_events):
+        # the first n of a uniform n_max-subset is a uniform n-subset
+        r = fwd[h][idx[:, :n]]
+        means[h] = r.mean(axis=1)
+        finals[h] = np.exp(np.log1p(r).sum(axis=1))
+    return means, finals
+
+
+def random_entry_baseline(fwd: np.ndarray, n_events: Tuple[int, ...], cfg: Config,
+                          seed: Optional[np.random.SeedSequence] = None) -> Dict[str, np.ndarray]:
+    """
+    Monte Carlo distribution of mean / final multiple for random entries, per hold length.
+    Entry days are drawn from the days where every hold length has an exit.
+    Returns {"mean": (H, n_draws), "final": (H, n_draws)}.
+    """
+    pool = np.flatnonzero(np.isfinite(fwd).all(axis=0))
+    if len(pool) < max(n_events):
+        raise ValueError("Fewer eligible entry days than events.")
+
+    n_blocks = -(-cfg.n_draws // cfg.block_size)
+    sizes = [min(cfg.block_size, cfg.n_draws - b * cfg.block_size) for b in range(n_blocks)]
+    seeds = (np.random.SeedSequence(cfg.seed) if seed is None else seed).spawn(n_blocks)
+
+    if cfg.n_jobs == 1 or n_blocks == 1:
+        parts = [_random_block(fwd, pool, n_events, d, s) for d, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=cfg.n_jobs) as ex:
+            parts = list(ex.map(_random_block, [fwd] * n_blocks, [pool] * n_blocks,
+                                [n_events] * n_blocks, sizes, seeds))
+
+    return {
+        "mean": np.concatenate([m for m, _ in parts], axis=1),
+        "final": np.concatenate([f for _, f in parts], axis=1),
+    }
+
+
+# -----------------------------
+# Main
+# -----------------------------
+
+def run_event_backtest(px: pd.DataFrame, events: pd.DatetimeIndex, cfg: Config) -> pd.DataFrame:
+    rows = []
+    ss = np.random.SeedSequence(cfg.seed).spawn(len(px.columns))
+    for etf, seed in zip(px.columns, ss):
+        s = px[etf].dropna()
+        fwd = forward_returns(s, cfg.hold_days)
+
+        # entry at the event day's close, or the next trading day's
+        pos = s.index.searchsorted(events, side="left")
+        pos = np.unique(pos[pos < len(s)])
+
+        stats = [event_stats(fwd[h, pos]) for h in range(len(cfg.hold_days))]
+        n_events = tuple(max(1, st["n"]) for st in stats)
+        mc = random_entry_baseline(fwd, n_events, cfg, seed)
+
+        for h, hold in enumerate(cfg.hold_days):
+            rows.append({
+                "ETF": etf,
+                "hold_days": hold,
+                **stats[h],
+                "rand_mean_avg": float(mc["mean"][h].mean()),
+                "rand_mean_p95": float(np.percentile(mc["mean"][h], 95)),
+                "rand_mean_p05": float(np.percentile(mc["mean"][h], 5)),
+                "rand_final_avg": float(mc["final"][h].mean()),
+                "rand_final_p95": float(np.percentile(mc["final"][h], 95)),
+            })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    cfg = Config(
+        tickers=["VXX"],
+        start="2018-01-01",
+        hold_days=(1, 2, 3, 5),
+        n_draws=100_000,
+        seed=7,
+    )
+
+    px = fetch_closes(cfg)
+    events = load_events(cfg.events_csv)
+    out = run_event_backtest(px, events, cfg)
+
+    print(out.to_string(index=False))
+    out.to_csv(cfg.out_csv, index=False)
+    print(f"\nSaved: {cfg.out_csv}")
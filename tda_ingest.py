@@ -0,0 +1,126 @@
+"""
+Price ingestion shared by the TDA notebooks (Phase 1 collection and the Phase 2-4
+fallback loaders)
+
+What it does:
+- Pluggable Close-price sources with fetch(ticker, start, end), all end-exclusive
+  like yfinance: YFinanceSource, DirectorySource (local parquet / csv files),
+  HTTPSource (CSV over HTTP)
+- fetch_universe: bounded thread pool over tickers, exceptions retried with
+  exponential backoff + jitter, per-ticker error reporting
+
+Keep this file next to the notebooks (upload it alongside them on Colab).
+
+Install:
+pip install numpy pandas yfinance
+"""
+
+import io
+import os
+import time
+import random
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+
+def _close_series(df):
+    """Close column of a price frame (index = dates), or None if unusable."""
+    if df is None or df.empty:
+        return None
+    if 'Close' not in df.columns:
+        return None
+    if not isinstance(df.index, pd.DatetimeIndex):
+        if 'Date' in df.columns:
+            df = df.set_index('Date')
+        df.index = pd.to_datetime(df.index)
+    return df['Close']
+
+
+class YFinanceSource:
+    """yfinance Ticker.history (one HTTP round trip per ticker)."""
+
+    def fetch(self, ticker, start, end):
+        import yfinance as yf  # notebooks pip-install it before the first fetch
+
+        hist = yf.Ticker(ticker).history(start=start, end=end)
+        return _close_series(hist)
+
+
+class DirectorySource:
+    """Local directory of <TICKER>.parquet / <TICKER>.csv files with a Date index and a Close column."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def fetch(self, ticker, start, end):
+        for ext in ('.parquet', '.csv'):
+            path = os.path.join(self.root, ticker + ext)
+            if os.path.exists(path):
+                if ext == '.parquet':
+                    df = pd.read_parquet(path)
+                else:
+                    df = pd.read_csv(path, index_col=0, parse_dates=True)
+                close = _close_series(df)
+                if close is None:
+                    return None
+                close = close.loc[start:]
+                # end is exclusive, as in yfinance
+                return close if end is None else close[close.index < pd.Timestamp(end)]
+        return None
+
+
+class HTTPSource:
+    """CSV over HTTP: GET {base_url}/{TICKER}.csv?start=...&end=... (e.g. a local stand-in server)."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def fetch(self, ticker, start, end):
+        url = f"{self.base_url}/{ticker}.csv?start={start}&end={end}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+                body = resp.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None      # unknown ticker: no data, not worth a retry
+            raise
+        return _close_series(pd.read_csv(io.BytesIO(body), index_col=0, parse_dates=True))
+
+
+def fetch_universe(source, tickers, start, end, max_workers=16, retries=3, backoff=1.0, verbose=True):
+    """
+    Fetch Close prices for many tickers concurrently from any source with fetch(ticker, start, end).
+    Exceptions are retried with exponential backoff (+ jitter); an empty result is final.
+    Returns (prices_dict in ticker order, failed_tickers).
+    """
+    def fetch_one(ticker):
+        for attempt in range(retries + 1):
+            try:
+                return source.fetch(ticker, start, end), None
+            except Exception as e:
+                if attempt == retries:
+                    return None, e
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_one, t): t for t in tickers}
+        for fut in as_completed(futures):
+            ticker = futures[fut]
+            close, err = fut.result()
+            results[ticker] = close
+            if verbose:
+                if err is not None:
+                    print(f"  {ticker} ❌ Error: {str(err)[:50]}")
+                elif close is None or close.empty:
+                    print(f"  {ticker} ❌ No data")
+                else:
+                    print(f"  {ticker} ✅")
+
+    prices_dict = {t: results[t] for t in tickers if results[t] is not None and not results[t].empty}
+    failed_tickers = [t for t in tickers if t not in prices_dict]
+    return prices_dict, failed_tickers
@@ -0,0 +1,200 @@
+"""
+Modeled VXX Option Overlay: Vectorized Black-Scholes Grid over Events
+
+What it does:
+- Prices a call bought at each event close and sold `hold_days` later, for every
+  event x hold_days x DTE x moneyness combination in one broadcast Black-Scholes call
+- IV from a realized-vol proxy (rolling std of log returns, floored), or interpolated
+  in total variance along a term structure (date x tenor-days table) when one is given
+- Model of the modeled_VXX_atm_call_hold{h}_dte{d}.csv files:
+    T0 = dte / 365, T1 = (dte - hold_days) / 365 (trading days held count as days),
+    rate 3%, ret = C1 / C0 - 1 - cost (10 bps round trip), cum = compounded ret over events
+- Writes one CSV per (hold, DTE) for the ATM strike in that file format
+
+Inputs:
+- events_csv: one event date per row in a "date" column (entry at that day's close)
+
+Install:
+pip install yfinance numpy pandas scipy
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from scipy.special import ndtr
+
+
+# -----------------------------
+# Config
+# -----------------------------
+
+@dataclass
+class Config:
+    ticker: str = "VXX"
+    start: str = "2018-01-01"
+    end: Optional[str] = None
+
+    hold_days: Tuple[int, ...] = (1, 3)
+    dtes: Tuple[int, ...] = (28,)
+    moneyness: Tuple[float, ...] = (1.0,)   # K / S0
+
+    rate: float = 0.03
+    cost: float = 0.001                     # round-trip, as a fraction of the premium
+
+    # realized-vol IV proxy
+    rv_window: int = 20
+    iv_floor: float = 0.60
+
+    events_csv: str = "topology_events.csv"
+    out_pattern: str = "modeled_VXX_atm_call_hold{hold}_dte{dte}.csv"
+
+
+# -----------------------------
+# Data
+# -----------------------------
+
+def fetch_close(cfg: Config) -> pd.Series:
+    raw = yf.download(cfg.ticker, start=cfg.start, end=cfg.end, progress=False, auto_adjust=False)
+    if raw is None or raw.empty:
+        raise RuntimeError("yfinance returned no data. Check ticker/network.")
+
+    px = raw["Adj Close"] if "Adj Close" in raw.columns.get_level_values(0) else raw["Close"]
+    if isinstance(px, pd.DataFrame):
+        px = px.iloc[:, 0]
+    return px.dropna().rename(cfg.ticker)
+
+
+def load_events(path: str) -> pd.DatetimeIndex:
+    ev = pd.read_csv(path, parse_dates=["date"])
+    return pd.DatetimeIndex(ev["date"]).sort_values()
+
+
+def realized_vol_iv(px: pd.Series, cfg: Config) -> np.ndarray:
+    """Annualized rolling realized vol, floored at cfg.iv_floor (floor also fills the warm-up)."""
+    rv = np.log(px).diff().rolling(cfg.rv_window).std() * np.sqrt(252)
+    return np.fmax(rv.to_numpy(), cfg.iv_floor)
+
+
+def term_structure_iv(ts: np.ndarray, tenors: np.ndarray, rows: np.ndarray, t_days: np.ndarray) -> np.ndarray:
+    """
+    IV at t_days (any shape, broadcast against rows) from a (dates, tenors) IV table:
+    linear in total variance between tenors, flat IV outside them.
+    """
+    t = np.clip(t_days, tenors[0], tenors[-1])
+    j = np.clip(np.searchsorted(tenors, t, side="right") - 1, 0, len(tenors) - 2)
+    t0, t1 = tenors[j], tenors[j + 1]
+    v0 = ts[rows, j] ** 2 * t0
+    v1 = ts[rows, j + 1] ** 2 * t1
+    w = np.where(t1 > t0, (t - t0) / np.where(t1 > t0, t1 - t0, 1.0), 0.0)
+    return np.sqrt((v0 + w * (v1 - v0)) / t)
+
+
+# -----------------------------
+# Pricing
+# -----------------------------
+
+def bs_call(S: np.ndarray, K: np.ndarray, T: np.ndarray, sigma: np.ndarray, r: float) -> np.ndarray:
+    """Black-Scholes call, broadcasting over all inputs; intrinsic value at T <= 0."""
+    S, K, T, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, K, T, sigma)))
+    live = T > 0
+    Tl = np.where(live, T, 1.0)
+    vol = sigma * np.sqrt(Tl)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * Tl) / vol
+    d2 = d1 - vol
+    price = S * ndtr(d1) - K * np.exp(-r * Tl) * ndtr(d2)
+    return np.where(live, price, np.maximum(S - K, 0.0))
+
+
+def price_grid(px: pd.Series, events: pd.DatetimeIndex, cfg: Config,
+               term_structure: Optional[pd.DataFrame] = None) -> Dict[str, np.ndarray]:
+    """
+    Entry/exit legs for every (event, hold, DTE, moneyness) in one pass.
+    Arrays have shape (E, H, D, M); exits past the end of the data are NaN.
+    term_structure: IV table indexed by date with tenor-days columns (None => realized-vol proxy).
+    """
+    s = px.to_numpy(dtype=float)
+    i0 = np.unique(px.index.searchsorted(events, side="left"))
+    i0 = i0[i0 < len(s)]
+
+    hold = np.asarray(cfg.hold_days)[None, :, None, None]
+    dte = np.asarray(cfg.dtes, dtype=float)[None, None, :, None]
+    m = np.asarray(cfg.moneyness, dtype=float)[None, None, None, :]
+
+    e0 = i0[:, None, None, None]
+    i1 = e0 + hold
+    ok = i1 < len(s)
+    i1 = np.where(ok, i1, e0)
+
+    S0 = s[e0]
+    S1 = np.where(ok, s[i1], np.nan)
+    K = S0 * m
+    T0 = dte / 365.0
+    T1 = (dte - hold) / 365.0
+
+    if term_structure is None:
+        iv = realized_vol_iv(px, cfg)
+        iv0, iv1 = iv[e0], iv[i1]
+    else:
+        ts = term_structure.reindex(px.index).ffill().bfill()
+        tenors = np.asarray(ts.columns, dtype=float)
+        table = ts.to_numpy(dtype=float)
+        iv0 = term_structure_iv(table, tenors, e0, dte)
+        iv1 = term_structure_iv(table, tenors, i1, np.fmax(dte - hold, 1.0))
+
+    C0 = bs_call(S0, K, T0, iv0, cfg.rate)
+    C1 = bs_call(S1, K, T1, iv1, cfg.rate)
+
+    shape = (len(i0), len(cfg.hold_days), len(cfg.dtes), len(cfg.moneyness))
+    out = {"entry": e0, "exit": np.where(ok, i1, -1), "S0": S0, "S1": S1, "K": K,
+           "iv0": iv0, "iv1": iv1, "C0": C0, "C1": C1, "ret": C1 / C0 - 1.0 - cfg.cost}
+    return {k: np.broadcast_to(v, shape) for k, v in out.items()}
+
+
+def grid_frame(px: pd.Series, grid: Dict[str, np.ndarray], cfg: Config) -> pd.DataFrame:
+    """Long table: one row per trade, cum compounded over events within each (hold, DTE, moneyness)."""
+    E, H, D, M = grid["C0"].shape
+    h, d, m = np.meshgrid(np.arange(H), np.arange(D), np.arange(M), indexing="ij")
+    cols = {k: np.moveaxis(v, 0, -1).reshape(-1) for k, v in grid.items()}   # (H, D, M, E) order
+
+    out = pd.DataFrame({
+        "date": px.index[cols["entry"]],
+        "exit_date": px.index[np.maximum(cols["exit"], 0)].where(cols["exit"] >= 0),
+        "hold_days": np.repeat(np.asarray(cfg.hold_days)[h.ravel()], E),
+        "dte": np.repeat(np.asarray(cfg.dtes)[d.ravel()], E),
+        "moneyness": np.repeat(np.asarray(cfg.moneyness)[m.ravel()], E),
+        **{k: cols[k] for k in ("S0", "S1", "K", "iv0", "iv1", "C0", "C1", "ret")},
+    })
+    out = out.dropna(subset=["ret"])
+    out["cum"] = (1.0 + out["ret"]).groupby([out["hold_days"], out["dte"], out["moneyness"]]).cumprod()
+    return out.reset_index(drop=True)
+
+
+# -----------------------------
+# Run
+# -----------------------------
+
+if __name__ == "__main__":
+    cfg = Config(
+        ticker="VXX",
+        start="2018-01-01",
+        hold_days=(1, 3),
+        dtes=(28,),
+        moneyness=(1.0,),
+        rate=0.03,
+        cost=0.001,
+    )
+
+    px = fetch_close(cfg)
+    events = load_events(cfg.events_csv)
+    trades = grid_frame(px, price_grid(px, events, cfg), cfg)
+
+    atm = trades[trades["moneyness"] == 1.0]
+    for (hold, dte), g in atm.groupby(["hold_days", "dte"]):
+        path = cfg.out_pattern.format(hold=hold, dte=dte)
+        g[["date", "exit_date", "hold_days", "S0", "S1", "K", "iv0", "iv1", "C0", "C1", "ret", "cum"]].to_csv(path, index=False)
+        print(f"Saved: {path}  (n={len(g)}, final cum={g['cum'].iloc[-1]:.3f})")
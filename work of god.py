@@ -16,10 +16,19 @@ pip install yfinance numpy pandas scipy scikit-learn matplotlib
 
 from __future__ import annotations
 
+import os
+import copy
+import json
+import hashlib
+import pickle
+import itertools
 import warnings
 warnings.filterwarnings("ignore")
 
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from functools import partial
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from typing import List, Tuple, Dict, Optional
 
 import numpy as np
@@ -27,12 +36,18 @@ import pandas as pd
 import yfinance as yf
 
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from scipy import sparse
 from scipy.linalg import eigh
+from scipy.sparse.linalg import lobpcg
 
+import sklearn
 from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 
+from price_store import PriceStore, extract_field
+
 
 # -----------------------------
 # Config
@@ -47,8 +62,19 @@ class Config:
 
     price_field: str = "Adj Close"
 
+    # Local price store (None => download everything each run); offline => never hit the network
+    store_dir: Optional[str] = None
+    offline: bool = False
+
     corr_lookback: int = 60
 
+    # Structure-feature graph: "dense" (full eigh; fine for ~10s of names) or, for large universes,
+    # "knn" (each name's graph_k most correlated neighbours) / "threshold" (every pair above graph_threshold)
+    graph: str = "dense"
+    graph_k: int = 10
+    graph_threshold: float = 0.3   # Phase 2 CORRELATION_THRESHOLD
+    n_eigs: int = 1                # sparse modes: Laplacian eigenvalues past the trivial one (> 1 adds lap_eig3, ...)
+
     # Risk label (future vol)
     label_horizon: int = 21
     risk_quantile: float = 0.75
@@ -66,6 +92,16 @@ class Config:
     max_iter: int = 500
     random_state: int = 42
 
+    # Walk-forward folds run in worker processes (1 => serial, None => all cores)
+    n_jobs: Optional[int] = 1
+    # Start each fold's MLP from the previous fold's weights (folds then run serially)
+    warm_start: bool = False
+    # Content-addressed cache of fitted folds (None => always retrain); oldest entries evicted past the cap
+    cache_dir: Optional[str] = None
+    cache_max_bytes: int = 512 * 2**20
+    # Persist the last fold's model for the online scorer (None => don't save)
+    model_path: Optional[str] = None
+
     # Short-vol proxy strength (bigger => more negative skew / more crash-sensitive)
     crash_lambda: float = 2.0
 
@@ -88,28 +124,36 @@ class Config:
 # -----------------------------
 
 def fetch_prices(cfg: Config) -> pd.DataFrame:
-    raw = yf.download(
-        cfg.tickers,
-        start=cfg.start,
-        end=cfg.end,
-        progress=False,
-        group_by="column",
-        auto_adjust=False,
-        threads=True,
-    )
-
-    if raw is None or raw.empty:
-        raise RuntimeError("yfinance returned no data. Check tickers/network.")
+    """
+    yfinance download, or the local PriceStore when cfg.store_dir is set
+    (only missing days are appended; cfg.offline=True reads the store without network).
+    """
+    store = PriceStore(cfg.store_dir) if cfg.store_dir is not None else None
+    raw = None
+
+    if store is not None:
+        if not cfg.offline:
+            store.sync(cfg.tickers, cfg.start, cfg.end)
+    elif cfg.offline:
+        raise RuntimeError("offline=True needs cfg.store_dir (no local price store configured).")
+    else:
+        raw = yf.download(
+            cfg.tickers,
+            start=cfg.start,
+            end=cfg.end,
+            progress=False,
+            group_by="column",
+            auto_adjust=False,
+            threads=True,
+        )
+
+        if raw is None or raw.empty:
+            raise RuntimeError("yfinance returned no data. Check tickers/network.")
 
     def extract_field(field: str) -> Optional[pd.DataFrame]:
-        if isinstance(raw.columns, pd.MultiIndex):
-            if field in raw.columns.get_level_values(0):
-                return raw[field].copy()
-            return None
-        else:
-            if field in raw.columns:
-                return raw[field].copy()
-            return None
+        if store is not None:
+            return store.load(field, cfg.tickers, cfg.start, cfg.end)
+        return extract_field(raw, field, cfg.tickers)
 
     df = extract_field(cfg.price_field)
     if df is None:
@@ -120,6 +164,9 @@ def fetch_prices(cfg: Config) -> pd.DataFrame:
     if isinstance(df, pd.Series):
         df = df.to_frame()
 
+    if df.empty:
+        raise RuntimeError("No prices available. Check tickers/network or the local price store.")
+
     df = df.dropna(how="all").ffill().dropna()
     df = df.reindex(sorted(df.columns), axis=1)
     return df
@@ -133,8 +180,57 @@ def returns_from_prices(px: pd.DataFrame) -> pd.DataFrame:
 # Features (Topology Proxy)
 # -----------------------------
 
-def corr_features(window_rets: pd.DataFrame) -> Dict[str, float]:
-    C = window_rets.corr().values
+def rolling_corr_stack(rets: pd.DataFrame, lookback: int, reseed: int = 252) -> np.ndarray:
+    """
+    Exact rolling correlation matrices, updated one day at a time.
+    Keeps running sums / cross-products (add the new row, drop the old one)
+    instead of calling .corr() on every window.
+
+    Returns C with shape (len(rets) - lookback, N, N) where
+    C[k] == rets.iloc[k : k + lookback].corr(), i.e. the window that
+    build_feature_matrix uses for date rets.index[lookback + k].
+    Sums are re-seeded from scratch every `reseed` steps to stop float drift.
+    """
+    x = rets.to_numpy(dtype=float)
+    if np.isnan(x).any():
+        raise ValueError("rolling_corr_stack expects returns without NaNs (see returns_from_prices).")
+
+    n_obs, n = x.shape
+    m = n_obs - lookback
+    if m <= 0:
+        return np.empty((0, n, n))
+
+    # correlation is shift-invariant; centering keeps the cross-products well conditioned.
+    # Center on the first window so appending new days leaves earlier matrices bit-identical.
+    x = x - x[:lookback].mean(axis=0)
+
+    out = np.empty((m, n, n))
+    s = np.zeros(n)
+    p = np.zeros((n, n))
+    for k in range(m):
+        if k % reseed == 0:
+            w = x[k : k + lookback]
+            s = w.sum(axis=0)
+            p = w.T @ w
+        else:
+            old, new = x[k - 1], x[k + lookback - 1]
+            s += new - old
+            p += np.outer(new, new) - np.outer(old, old)
+
+        cov = p - np.outer(s, s) / lookback
+        sd = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            C = cov / np.outer(sd, sd)
+        C[sd == 0.0, :] = np.nan
+        C[:, sd == 0.0] = np.nan
+        np.fill_diagonal(C, np.where(sd > 0.0, 1.0, np.nan))
+        out[k] = np.clip(C, -1.0, 1.0)
+
+    return out
+
+
+def corr_features(window_rets) -> Dict[str, float]:
+    C = window_rets if isinstance(window_rets, np.ndarray) else window_rets.corr().values
     n = C.shape[0]
     if n < 3:
         return {"mean_corr": np.nan, "corr_std": np.nan, "fiedler": np.nan}
@@ -160,14 +256,215 @@ def corr_features(window_rets: pd.DataFrame) -> Dict[str, float]:
     return {"mean_corr": mean_corr, "corr_std": corr_std, "fiedler": fiedler}
 
 
+def corr_features_batch(C: np.ndarray, max_bytes: int = 256 * 2**20) -> Dict[str, np.ndarray]:
+    """
+    Batched corr_features over a stack of correlation matrices (K, N, N).
+    Builds every normalized Laplacian with broadcasting (no np.diag / matmuls)
+    and takes the 2nd smallest eigenvalue from one stacked eigvalsh call per
+    chunk; chunks are sized so each Laplacian block stays under `max_bytes`.
+    """
+    K, n = C.shape[0], C.shape[1]
+    if n < 3:
+        nan = np.full(K, np.nan)
+        return {"mean_corr": nan, "corr_std": nan.copy(), "fiedler": nan.copy()}
+
+    iu = np.triu_indices(n, k=1)
+    off = C[:, iu[0], iu[1]]
+    mean_corr = np.nanmean(off, axis=1)
+    corr_std = np.nanstd(off, axis=1)
+
+    fiedler = np.zeros(K)
+    chunk = max(1, int(max_bytes // (n * n * 8)))
+    for lo in range(0, K, chunk):
+        W = np.clip(C[lo : lo + chunk], 0.0, 1.0)
+        W[:, np.arange(n), np.arange(n)] = 0.0
+        d = W.sum(axis=2)
+
+        # isolates -> fiedler 0 (as in corr_features); NaN correlations -> NaN
+        bad = np.isnan(d).any(axis=1)
+        iso = ~bad & np.any(d <= 1e-12, axis=1)
+        ok = ~(bad | iso)
+
+        f = np.zeros(len(W))
+        f[bad] = np.nan
+        if ok.any():
+            r = 1.0 / np.sqrt(d[ok])
+            L = -(r[:, :, None] * W[ok] * r[:, None, :])
+            L[:, np.arange(n), np.arange(n)] += 1.0
+            f[ok] = np.linalg.eigvalsh(L)[:, 1]
+        fiedler[lo : lo + chunk] = f
+
+    return {"mean_corr": mean_corr, "corr_std": corr_std, "fiedler": fiedler}
+
+
+def _standardized_window(w: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Columns of a (L, N) returns window scaled so Z.T @ Z is their correlation matrix; zero-variance columns flagged."""
+    z = w - w.mean(axis=0)
+    sd = np.sqrt((z * z).sum(axis=0))
+    ok = sd > 0
+    z[:, ok] /= sd[ok]
+    z[:, ~ok] = 0.0
+    return z, ok
+
+
+def corr_moments(Z: np.ndarray) -> Tuple[float, float]:
+    """
+    mean_corr / corr_std (as corr_features) of Z.T @ Z without forming it:
+    sum of all correlations = |Z 1|^2, sum of squares = |Z Z.T|_F^2 (an L x L Gram).
+    """
+    n = Z.shape[1]
+    if n < 3:
+        return np.nan, np.nan
+    pairs = n * (n - 1)
+    s1 = float(np.square(Z.sum(axis=1)).sum()) - n
+    s2 = float(np.square(Z @ Z.T).sum()) - n
+    mean = s1 / pairs
+    return mean, float(np.sqrt(max(s2 / pairs - mean * mean, 0.0)))
+
+
+def knn_graph(Z: np.ndarray, k: int, block: int = 256) -> sparse.csr_matrix:
+    """
+    Sparse kNN correlation graph on the columns of a standardized window Z (L, N):
+    each node keeps its k most correlated neighbours with positive correlation,
+    weights clip(corr, 0, 1) as in corr_features, symmetrized by max(W, W.T).
+    Correlation rows are formed `block` at a time, so memory stays O(N * (k + block)).
+    """
+    n = Z.shape[1]
+    k = min(k, n - 1)
+    rows, cols, vals = [], [], []
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        C = Z[:, lo:hi].T @ Z
+        C[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        nb = np.argpartition(-C, k - 1, axis=1)[:, :k]
+        w = np.take_along_axis(C, nb, axis=1)
+        keep = w > 0.0
+        rows.append(np.repeat(np.arange(lo, hi), k)[keep.ravel()])
+        cols.append(nb[keep])
+        vals.append(np.minimum(w[keep], 1.0))
+
+    A = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    return A.maximum(A.T).tocsr()
+
+
+def threshold_graph(Z: np.ndarray, threshold: float, block: int = 256) -> sparse.csr_matrix:
+    """
+    Sparse threshold graph on the columns of a standardized window Z (L, N): every pair with
+    correlation above `threshold` (and > 0), weights clip(corr, 0, 1) as in corr_features.
+    Rows are formed `block` at a time; memory is O(N * block) plus the edges kept.
+    """
+    n = Z.shape[1]
+    thr = max(threshold, 0.0)
+    rows, cols, vals = [], [], []
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        C = Z[:, lo:hi].T @ Z
+        C[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf
+        i, j = np.nonzero(C > thr)
+        rows.append(i + lo)
+        cols.append(j)
+        vals.append(np.minimum(C[i, j], 1.0))
+
+    return sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+
+def _dense_spectrum(M: np.ndarray, n_eigs: int) -> np.ndarray:
+    """The n_eigs smallest nontrivial eigenvalues 2 - mu of the dense I + D^-1/2 W D^-1/2."""
+    n = M.shape[0]
+    ev = np.linalg.eigvalsh(2.0 * np.eye(n) - M)
+    vals = np.full(n_eigs, np.nan)
+    vals[: n - 1] = ev[1 : 1 + n_eigs]
+    return np.clip(vals, 0.0, 2.0)
+
+
+def sparse_fiedler(W: sparse.csr_matrix, n_eigs: int = 1, X0: Optional[np.ndarray] = None,
+                   tol: float = 1e-6, maxiter: int = 500, dense_max: int = 2000) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    The n_eigs smallest nontrivial eigenvalues of the normalized Laplacian of sparse W (the first is
+    the Fiedler value) by LOBPCG on I + D^-1/2 W D^-1/2 (eigenvalue 2 - lambda, largest end), with
+    the trivial eigenvector D^1/2 1 as a constraint. X0 (N, n_eigs) warm-starts the iteration,
+    e.g. with the previous day's eigenvectors.
+    Isolated nodes => zeros, as in corr_features. If LOBPCG stops short of `tol` it is retried once
+    from a fresh random start with 4x maxiter; if that misses too, graphs of up to dense_max nodes
+    fall back to a dense eigvalsh and larger ones give NaN values. Returns (values, vectors).
+    """
+    n = W.shape[0]
+    d = np.asarray(W.sum(axis=1)).ravel()
+    if np.any(d <= 1e-12):
+        return np.zeros(n_eigs), None
+
+    r = 1.0 / np.sqrt(d)
+    M = sparse.identity(n, format="csr") + sparse.diags(r) @ W @ sparse.diags(r)
+    if n - 1 < 5 * n_eigs:
+        # too small for LOBPCG (it would fall back to a dense solver without constraints)
+        return _dense_spectrum(M.toarray(), n_eigs), None
+
+    y = np.sqrt(d)[:, None] / np.sqrt(d.sum())
+
+    rng = np.random.default_rng(0)
+    for X, iters in ((X0, maxiter), (None, 4 * maxiter)):
+        if X is None or X.shape != (n, n_eigs):
+            X = rng.standard_normal((n, n_eigs))
+        vals, vecs = lobpcg(M, X, Y=y, tol=tol, maxiter=iters, largest=True)
+
+        # lobpcg only warns when it stops at maxiter (and warnings are silenced above): check the residuals
+        resid = np.linalg.norm(M @ vecs - vecs * vals, axis=0)
+        if np.all(np.isfinite(resid)) and resid.max() <= tol * max(1.0, np.abs(vals).max()):
+            order = np.argsort(-vals)
+            return np.clip(2.0 - vals[order], 0.0, 2.0), vecs[:, order]
+
+    # never densify a large graph: that is the N x N matrix this mode exists to avoid
+    if n <= dense_max:
+        return _dense_spectrum(M.toarray(), n_eigs), None
+    return np.full(n_eigs, np.nan), None
+
+
+def sparse_feature_matrix(rets: pd.DataFrame, cfg: Config) -> pd.DataFrame:
+    """
+    build_feature_matrix for large universes: same windows, columns and index, but
+    mean_corr / corr_std from window moments and the Fiedler value of a sparse kNN /
+    threshold graph (cfg.graph), warm-started from the previous window's eigenvectors.
+    Per window memory is O(N * graph_k) for knn (O(edges) for threshold) plus the (lookback, N) window.
+    cfg.n_eigs > 1 adds lap_eig3, lap_eig4, ... (next normalized Laplacian eigenvalues).
+    Windows where the eigensolver did not converge are left NaN and counted in a printed note.
+    """
+    x = rets.to_numpy(dtype=float)
+    if np.isnan(x).any():
+        raise ValueError("sparse_feature_matrix expects returns without NaNs (see returns_from_prices).")
+
+    L, n = cfg.corr_lookback, x.shape[1]
+    m = max(len(x) - L, 0)
+    if cfg.graph == "knn":
+        graph = lambda Z: knn_graph(Z, cfg.graph_k)
+    elif cfg.graph == "threshold":
+        graph = lambda Z: threshold_graph(Z, cfg.graph_threshold)
+    else:
+        raise ValueError(f"Unknown graph: {cfg.graph!r} (expected 'dense', 'knn' or 'threshold')")
+    feats = np.full((m, 2 + cfg.n_eigs), np.nan)
+
+    X0, failed = None, 0
+    for k in range(m):
+        Z, ok = _standardized_window(x[k : k + L])
+        feats[k, :2] = corr_moments(Z[:, ok])
+        if n < 3 or not ok.all():
+            continue    # NaN correlations => NaN fiedler, as in corr_features_batch
+        vals, vecs = sparse_fiedler(graph(Z), cfg.n_eigs, X0)
+        feats[k, 2:] = vals
+        failed += int(np.isnan(vals[0]))
+        X0 = vecs if vecs is not None else X0
+    if failed:
+        print(f"sparse_feature_matrix: eigensolver did not converge in {failed} of {m} windows (left NaN)")
+
+    cols = ["mean_corr", "corr_std", "fiedler"] + [f"lap_eig{j + 3}" for j in range(cfg.n_eigs - 1)]
+    return pd.DataFrame(feats, index=pd.Index(rets.index[L:], name="date"), columns=cols)
+
+
 def build_feature_matrix(rets: pd.DataFrame, cfg: Config) -> pd.DataFrame:
-    rows, idx = [], []
-    for t in range(cfg.corr_lookback, len(rets)):
-        end = rets.index[t]
-        window = rets.iloc[t - cfg.corr_lookback : t]
-        rows.append(corr_features(window))
-        idx.append(end)
-    return pd.DataFrame(rows, index=pd.Index(idx, name="date"))
+    if cfg.graph != "dense":
+        return sparse_feature_matrix(rets, cfg)
+
+    C = rolling_corr_stack(rets, cfg.corr_lookback)
+    return pd.DataFrame(corr_features_batch(C), index=pd.Index(rets.index[cfg.corr_lookback:], name="date"))
 
 
 # -----------------------------
@@ -256,6 +553,140 @@ def cagr(equity: pd.Series) -> float:
     return float(equity.iloc[-1] ** (1 / years) - 1)
 
 
+def apply_exposure_and_costs_batch(exposure: np.ndarray, base_ret: np.ndarray, cost_bps: float,
+                                   dates: Optional[pd.DatetimeIndex] = None) -> Dict[str, np.ndarray]:
+    """
+    apply_exposure_and_costs for K exposure paths at once.
+    exposure: (K, T) (or (T,)) aligned to base_ret (T,) with no NaN returns; NaN exposures
+    are forward-filled, then set to 1.0, as in the scalar version.
+    Returns {"net": (K, T), "turnover": (K, T)} plus batch_metrics of the net returns.
+    """
+    E = np.atleast_2d(np.asarray(exposure, dtype=float))
+    r = np.asarray(base_ret, dtype=float)
+    K, T = E.shape
+
+    # forward-fill along time, then default to full exposure
+    nan = np.isnan(E)
+    if nan.any():
+        idx = np.where(nan, 0, np.arange(T))
+        np.maximum.accumulate(idx, axis=1, out=idx)
+        E = np.take_along_axis(E, idx, axis=1)
+        E[np.isnan(E)] = 1.0
+
+    turnover = np.zeros((K, T))
+    lagged = E.copy()
+    if T > 1:
+        turnover[:, 1:] = np.abs(np.diff(E, axis=1))
+        lagged[:, 1:] = E[:, :-1]
+
+    net = lagged * r - (cost_bps / 1e4) * turnover
+    return {"net": net, "turnover": turnover, **batch_metrics(net, dates)}
+
+
+def batch_metrics(net: np.ndarray, dates: Optional[pd.DatetimeIndex] = None) -> Dict[str, np.ndarray]:
+    """
+    sharpe / max_drawdown / cagr for every row of a (K, T) net-return array
+    (same conventions as the scalar functions; cagr needs the T dates),
+    plus annualized vol and win_rate (share of positive days among non-zero days).
+    """
+    K, T = net.shape
+    out = {"sharpe": np.zeros(K), "max_drawdown": np.zeros(K), "cagr": np.zeros(K),
+           "vol": np.zeros(K), "win_rate": np.zeros(K)}
+    if T == 0:
+        return out
+
+    if T >= 2:
+        sd = net.std(axis=1, ddof=1)
+        out["vol"] = np.sqrt(252) * sd
+        if T >= 10:
+            ok = sd != 0
+            out["sharpe"][ok] = np.sqrt(252) * net[ok].mean(axis=1) / sd[ok]
+
+    active = (net != 0).sum(axis=1)
+    out["win_rate"] = np.where(active > 0, (net > 0).sum(axis=1) / np.maximum(active, 1), 0.0)
+
+    eq = np.cumprod(1.0 + net, axis=1)
+    out["max_drawdown"] = (eq / np.maximum.accumulate(eq, axis=1) - 1.0).min(axis=1)
+
+    if dates is None:
+        out["cagr"][:] = np.nan
+    elif T >= 2 and (dates[-1] - dates[0]).days > 0:
+        years = (dates[-1] - dates[0]).days / 365.25
+        out["cagr"] = eq[:, -1] ** (1 / years) - 1
+    return out
+
+
+def _rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing max over `window` columns of a (K, T) array in O(T) (van Herk / Gil-Werman):
+    block prefix maxima and block suffix maxima, one lookup each per position.
+    The first window - 1 columns are NaN.
+    """
+    K, T = x.shape
+    out = np.full((K, T), np.nan)
+    if T < window:
+        return out
+
+    nb = -(-T // window)
+    pad = np.full((K, nb * window), -np.inf)
+    pad[:, :T] = x
+    blocks = pad.reshape(K, nb, window)
+    g = np.maximum.accumulate(blocks, axis=2).reshape(K, -1)
+    h = np.maximum.accumulate(blocks[:, :, ::-1], axis=2)[:, :, ::-1].reshape(K, -1)
+
+    e = np.arange(window - 1, T)
+    out[:, window - 1 :] = np.maximum(h[:, e - window + 1], g[:, e])
+    return out
+
+
+def rolling_metrics(net: np.ndarray, window: int = 252, dates: Optional[pd.DatetimeIndex] = None) -> Dict[str, np.ndarray]:
+    """
+    Trailing-window metrics for every row of a (K, T) net-return array, each (K, T) with
+    NaN for the first window - 1 columns, from cumulative sums (no per-window passes):
+    - sharpe, vol: as r.rolling(window).mean() / .std() (ddof=1), annualized with sqrt(252)
+    - cagr: compounded window return annualized over the window's calendar days
+      (252 days per year without dates)
+    - win_rate: positive days / non-zero days in the window
+    - drawdown: equity vs its peak over the trailing window
+    """
+    net = np.asarray(net, dtype=float)
+    K, T = net.shape
+    w = window
+    out = {k: np.full((K, T), np.nan) for k in ("sharpe", "vol", "cagr", "win_rate", "drawdown")}
+    if T < w or w < 2:
+        return out
+
+    def window_sum(v: np.ndarray) -> np.ndarray:
+        c = np.zeros((K, T + 1))
+        np.cumsum(v, axis=1, out=c[:, 1:])
+        return c[:, w:] - c[:, :-w]
+
+    # centering keeps the sum-of-squares difference well conditioned
+    x = net - net.mean(axis=1, keepdims=True)
+    s, q = window_sum(x), window_sum(x * x)
+    var = np.clip((q - s * s / w) / (w - 1), 0.0, None)
+    sd = np.sqrt(var)
+    mean = s / w + net.mean(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["sharpe"][:, w - 1 :] = np.sqrt(252) * mean / sd
+    out["vol"][:, w - 1 :] = np.sqrt(252) * sd
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.exp(window_sum(np.log1p(net)))
+        if dates is None:
+            years = np.full(T - w + 1, w / 252)
+        else:
+            years = (dates[w - 1 :] - dates[: T - w + 1]).days.to_numpy() / 365.25
+        out["cagr"][:, w - 1 :] = np.where(years > 0, growth ** (1 / np.where(years > 0, years, 1.0)) - 1, 0.0)
+
+        active = window_sum((net != 0).astype(float))
+        out["win_rate"][:, w - 1 :] = np.where(active > 0, window_sum((net > 0).astype(float)) / active, 0.0)
+
+    eq = np.cumprod(1.0 + net, axis=1)
+    out["drawdown"] = eq / _rolling_max(eq, w) - 1.0
+    return out
+
+
 # -----------------------------
 # Walk-forward splits
 # -----------------------------
@@ -278,6 +709,238 @@ def walk_forward_splits(dates: pd.DatetimeIndex, cfg: Config) -> List[Tuple[pd.T
     return splits
 
 
+# -----------------------------
+# Fold Artifact Cache
+# -----------------------------
+
+# Config fields that change how/where we run, not what a fold computes
+# Bump when _run_fold or the cached fold artifacts change, so old entries stop matching
+CACHE_VERSION = 1
+
+_CACHE_IGNORE = ("start", "end", "store_dir", "offline", "n_jobs", "cache_dir", "cache_max_bytes", "model_path")
+
+
+class ArtifactCache:
+    """
+    Content-addressed pickle store: <root>/<key[:2]>/<key>.pkl.
+    Hits refresh the file mtime; once the directory passes max_bytes the
+    least recently used entries are deleted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 2**20):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".pkl")
+
+    def get(self, key: str) -> Optional[object]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                obj = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated file, or a pickle from other code / library versions: a miss
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        os.utime(path)
+        return obj
+
+    def put(self, key: str, obj: object) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def evict(self) -> None:
+        entries = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".pkl"):
+                    st = os.stat(os.path.join(dirpath, name))
+                    entries.append((st.st_mtime, st.st_size, os.path.join(dirpath, name)))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def fold_keys(cfg: Config, data: Dict[str, object], bounds) -> List[str]:
+    """
+    One cache key per fold: sha256 over CACHE_VERSION, the sklearn / pandas versions, the
+    Config fields that affect training and the fold's train/test slices of every aligned panel.
+    With cfg.warm_start a fold also depends on the previous one, so keys are chained.
+    """
+    fields = {k: v for k, v in asdict(cfg).items() if k not in _CACHE_IGNORE}
+    base = repr((CACHE_VERSION, sklearn.__version__, pd.__version__, sorted(fields.items()))).encode()
+
+    keys, prev = [], ""
+    for (i0, i1, j0, j1) in bounds:
+        h = hashlib.sha256(base)
+        for name in sorted(data):
+            for part in (data[name].iloc[i0:i1], data[name].iloc[j0:j1]):
+                h.update(name.encode())
+                if isinstance(part, pd.DataFrame):
+                    h.update(repr(list(part.columns)).encode())
+                h.update(np.ascontiguousarray(part.index.asi8).tobytes())
+                h.update(np.ascontiguousarray(part.to_numpy(dtype=float)).tobytes())
+        if cfg.warm_start:
+            h.update(prev.encode())
+        prev = h.hexdigest()
+        keys.append(prev)
+    return keys
+
+
+# -----------------------------
+# Walk-forward fold execution
+# -----------------------------
+
+# Aligned panels for the current run; set once per worker by the pool initializer
+_FOLD_DATA: Dict[str, object] = {}
+
+
+def _init_fold_worker(data: Dict[str, object]) -> None:
+    global _FOLD_DATA
+    _FOLD_DATA = data
+
+
+def fold_bounds(dates: pd.DatetimeIndex, splits) -> List[Tuple[int, int, int, int]]:
+    """Positional [start, stop) train/test slices for each date split (dates must be sorted)."""
+    bounds = []
+    for (tr_s, tr_e, te_s, te_e) in splits:
+        bounds.append((
+            int(dates.searchsorted(tr_s, side="left")), int(dates.searchsorted(tr_e, side="right")),
+            int(dates.searchsorted(te_s, side="left")), int(dates.searchsorted(te_e, side="right")),
+        ))
+    return bounds
+
+
+def make_model(cfg: Config, prev: Optional[Pipeline] = None) -> Pipeline:
+    """Fresh scaler + MLP pipeline, or with cfg.warm_start a copy of the previous fold's fitted one."""
+    if cfg.warm_start and prev is not None:
+        # scaler refits on the new window; MLP continues from the previous weights
+        model = copy.deepcopy(prev)
+        model.set_params(mlp__warm_start=True)
+        # best loss was measured on the previous window; reset it so early stopping judges this one
+        model.named_steps["mlp"].best_loss_ = np.inf
+        return model
+
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("mlp", MLPClassifier(
+            hidden_layer_sizes=cfg.hidden_layers,
+            activation="relu",
+            alpha=cfg.alpha_l2,
+            max_iter=cfg.max_iter,
+            random_state=cfg.random_state
+        ))
+    ])
+
+
+def _run_fold(cfg: Config, split, bounds, data: Optional[Dict[str, object]] = None,
+              prev_model: Optional[Pipeline] = None) -> Optional[Dict[str, object]]:
+    """Train/score one walk-forward fold; None if the fold is too short."""
+    data = _FOLD_DATA if data is None else data
+    (tr_s, tr_e, te_s, te_e) = split
+    (i0, i1, j0, j1) = bounds
+
+    X = data["X"]
+    X_tr, X_te = X.iloc[i0:i1], X.iloc[j0:j1]
+    vol_tr = data["future_vol"].iloc[i0:i1]
+    base_te = data["base_proxy"].iloc[j0:j1]
+
+    if len(X_tr) < 200 or len(X_te) < 50:
+        return None
+
+    # TRAIN-only threshold for regime label
+    thr = float(np.nanquantile(vol_tr.dropna(), cfg.risk_quantile))
+    y_tr = (vol_tr >= thr).astype(int).fillna(0).values
+
+    # NN
+    model = make_model(cfg, prev_model)
+    model.fit(X_tr.values, y_tr)
+
+    p_risk = pd.Series(model.predict_proba(X_te.values)[:, 1], index=X_te.index, name="p_risk")
+
+    # Stepwise exposure gating
+    exposure = stepwise_exposure(p_risk, cfg)
+
+    # Base vs overlay returns
+    # Base: full exposure (1.0) to the proxy
+    base_ret = apply_exposure_and_costs(base_te, pd.Series(1.0, index=base_te.index), cfg.cost_bps).rename("base_ret")
+    overlay_ret = apply_exposure_and_costs(base_te, exposure, cfg.cost_bps).rename("overlay_ret")
+
+    # fold stats (both streams in one columnar pass)
+    m = batch_metrics(np.vstack([base_ret.to_numpy(), overlay_ret.to_numpy()]))
+
+    return {
+        "base_ret": base_ret,
+        "overlay_ret": overlay_ret,
+        "p_risk": p_risk,
+        "exposure": exposure,
+        "X_te": X_te,
+        "model": model,
+        "thr": thr,
+        "stats": {
+            "test_start": str(te_s.date()),
+            "test_end": str(te_e.date()),
+            "base_sharpe": float(m["sharpe"][0]),
+            "overlay_sharpe": float(m["sharpe"][1]),
+            "base_maxdd": float(m["max_drawdown"][0]),
+            "overlay_maxdd": float(m["max_drawdown"][1]),
+            "avg_p_risk": float(p_risk.mean()),
+            "avg_exposure": float(exposure.mean()),
+            "mlp_n_iter": int(model.named_steps["mlp"].n_iter_),
+        },
+    }
+
+
+def run_folds(cfg: Config, data: Dict[str, object], splits) -> List[Optional[Dict[str, object]]]:
+    """
+    Run every fold, serially or in a process pool (cfg.n_jobs).
+    The aligned panels go to each worker once via the initializer; results come back in split order.
+    With cfg.warm_start each fold starts from the previous fitted model, so the folds run serially.
+    With cfg.cache_dir, folds whose inputs are unchanged are loaded instead of retrained.
+    """
+    bounds = fold_bounds(data["X"].index, splits)
+    cache = ArtifactCache(cfg.cache_dir, cfg.cache_max_bytes) if cfg.cache_dir is not None else None
+    keys = fold_keys(cfg, data, bounds) if cache is not None else [None] * len(splits)
+    results = [cache.get(k) if cache is not None else None for k in keys]
+    todo = [i for i, res in enumerate(results) if res is None]
+
+    if cfg.warm_start:
+        prev = None
+        for i, (sp, bd) in enumerate(zip(splits, bounds)):
+            if results[i] is None:
+                results[i] = _run_fold(cfg, sp, bd, data, prev)
+            if results[i] is not None:
+                prev = results[i]["model"]
+    elif cfg.n_jobs == 1 or len(todo) <= 1:
+        for i in todo:
+            results[i] = _run_fold(cfg, splits[i], bounds[i], data)
+    else:
+        with ProcessPoolExecutor(max_workers=cfg.n_jobs, initializer=_init_fold_worker, initargs=(data,)) as pool:
+            fresh = pool.map(partial(_run_fold, cfg), [splits[i] for i in todo], [bounds[i] for i in todo])
+            for i, res in zip(todo, fresh):
+                results[i] = res
+
+    if cache is not None:
+        for i in todo:
+            if results[i] is not None:
+                cache.put(keys[i], results[i])
+        cache.evict()
+    return results
+
+
 # -----------------------------
 # Main system
 # -----------------------------
@@ -304,70 +967,15 @@ def run_system(cfg: Config) -> Dict[str, object]:
 
     splits = walk_forward_splits(X.index, cfg)
 
-    all_base = []
-    all_overlay = []
-    all_p_risk = []
-    all_exposure = []
-    all_X_te = []
-    fold_stats = []
+    data = {"X": X, "future_vol": future_vol, "base_proxy": base_proxy}
+    folds = [f for f in run_folds(cfg, data, splits) if f is not None]
 
-    for (tr_s, tr_e, te_s, te_e) in splits:
-        tr_mask = (X.index >= tr_s) & (X.index <= tr_e)
-        te_mask = (X.index >= te_s) & (X.index <= te_e)
-
-        X_tr, X_te = X.loc[tr_mask], X.loc[te_mask]
-        vol_tr, vol_te = future_vol.loc[tr_mask], future_vol.loc[te_mask]
-        base_te = base_proxy.loc[X_te.index]
-
-        if len(X_tr) < 200 or len(X_te) < 50:
-            continue
-
-        # TRAIN-only threshold for regime label
-        thr = float(np.nanquantile(vol_tr.dropna(), cfg.risk_quantile))
-        y_tr = (vol_tr >= thr).astype(int).fillna(0).values
-
-        # NN
-        model = Pipeline([
-            ("scaler", StandardScaler()),
-            ("mlp", MLPClassifier(
-                hidden_layer_sizes=cfg.hidden_layers,
-                activation="relu",
-                alpha=cfg.alpha_l2,
-                max_iter=cfg.max_iter,
-                random_state=cfg.random_state
-            ))
-        ])
-        model.fit(X_tr.values, y_tr)
-
-        p_risk = pd.Series(model.predict_proba(X_te.values)[:, 1], index=X_te.index, name="p_risk")
-
-        # Stepwise exposure gating
-        exposure = stepwise_exposure(p_risk, cfg)
-
-        # Base vs overlay returns
-        # Base: full exposure (1.0) to the proxy
-        base_ret = apply_exposure_and_costs(base_te, pd.Series(1.0, index=base_te.index), cfg.cost_bps).rename("base_ret")
-        overlay_ret = apply_exposure_and_costs(base_te, exposure, cfg.cost_bps).rename("overlay_ret")
-
-        all_base.append(base_ret)
-        all_overlay.append(overlay_ret)
-        all_p_risk.append(p_risk)
-        all_exposure.append(exposure)
-        all_X_te.append(X_te)
-
-        eq_b = (1 + base_ret).cumprod()
-        eq_o = (1 + overlay_ret).cumprod()
-
-        fold_stats.append({
-            "test_start": str(te_s.date()),
-            "test_end": str(te_e.date()),
-            "base_sharpe": sharpe(base_ret),
-            "overlay_sharpe": sharpe(overlay_ret),
-            "base_maxdd": max_drawdown(eq_b),
-            "overlay_maxdd": max_drawdown(eq_o),
-            "avg_p_risk": float(p_risk.mean()),
-            "avg_exposure": float(exposure.mean()),
-        })
+    all_base = [f["base_ret"] for f in folds]
+    all_overlay = [f["overlay_ret"] for f in folds]
+    all_p_risk = [f["p_risk"] for f in folds]
+    all_exposure = [f["exposure"] for f in folds]
+    all_X_te = [f["X_te"] for f in folds]
+    fold_stats = [f["stats"] for f in folds]
 
     if not all_overlay:
         raise RuntimeError("No valid folds produced. Expand date range or adjust cfg.")
@@ -393,16 +1001,418 @@ def run_system(cfg: Config) -> Dict[str, object]:
         "p_risk": pd.concat(all_p_risk).sort_index(),
         "exposure": pd.concat(all_exposure).sort_index(),
         "features": pd.concat(all_X_te).sort_index(),
+        "model": folds[-1]["model"],
+        "feature_names": list(X.columns),
         "config": cfg,
     }
+
+    if cfg.model_path is not None:
+        save_scoring_model(cfg.model_path, out["model"], cfg, out["feature_names"], rets)
     return out
 
 
+def compare_warm_start(cfg: Config) -> pd.DataFrame:
+    """Run cold- and warm-start training side by side: iterations, overlay Sharpe and p_risk gap per fold."""
+    cold = run_system(replace(cfg, warm_start=False))
+    warm = run_system(replace(cfg, warm_start=True))
+
+    fc, fw = cold["fold_stats"], warm["fold_stats"]
+    rows = []
+    for (_, c), (_, w) in zip(fc.iterrows(), fw.iterrows()):
+        pc = cold["p_risk"].loc[c["test_start"]:c["test_end"]]
+        pw = warm["p_risk"].loc[w["test_start"]:w["test_end"]]
+        rows.append({
+            "test_start": c["test_start"],
+            "test_end": c["test_end"],
+            "cold_n_iter": c["mlp_n_iter"],
+            "warm_n_iter": w["mlp_n_iter"],
+            "cold_overlay_sharpe": c["overlay_sharpe"],
+            "warm_overlay_sharpe": w["overlay_sharpe"],
+            "p_risk_mae": float((pc - pw).abs().mean()),
+        })
+    return pd.DataFrame(rows)
+
+
+# -----------------------------
+# Online Scoring
+# -----------------------------
+
+def save_scoring_model(path: str, model: Pipeline, cfg: Config, feature_names: List[str], rets: pd.DataFrame) -> None:
+    """Pickle the fitted scaler+MLP with the last corr_lookback returns, so a scorer starts primed."""
+    payload = {
+        "model": model,
+        "cfg": cfg,
+        "feature_names": list(feature_names),
+        "tickers": list(rets.columns),
+        "recent_returns": rets.iloc[-cfg.corr_lookback:],
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(payload, f)
+    os.replace(tmp, path)
+
+
+class RegimeScorer:
+    """
+    Long-lived p_risk / exposure scorer for one fitted fold model.
+
+    Keeps the last corr_lookback returns in a ring buffer with running sums and
+    cross-products (re-seeded every `reseed` bars, as in rolling_corr_stack), so a
+    new bar costs a rank-2 update, one N x N eigvalsh and a numpy MLP forward pass.
+    The score returned after the bar for day d is the one the backtest uses on the next day.
+    """
+
+    def __init__(self, model: Pipeline, cfg: Config, tickers: List[str], feature_names: List[str], reseed: int = 252):
+        scaler, mlp = model.named_steps["scaler"], model.named_steps["mlp"]
+        if mlp.activation != "relu" or mlp.out_activation_ != "logistic":
+            raise ValueError("RegimeScorer expects a binary relu MLPClassifier.")
+        if cfg.graph != "dense":
+            raise ValueError("RegimeScorer computes dense-graph features; train with cfg.graph='dense'.")
+
+        self.cfg = cfg
+        self.tickers = list(tickers)
+        self.feature_names = list(feature_names)
+        self.reseed = reseed
+
+        self._mu = np.asarray(scaler.mean_, dtype=float)
+        self._scale = np.asarray(scaler.scale_, dtype=float)
+        self._coefs = [np.asarray(w, dtype=float) for w in mlp.coefs_]
+        self._intercepts = [np.asarray(b, dtype=float) for b in mlp.intercepts_]
+
+        n = len(self.tickers)
+        self._buf = np.zeros((cfg.corr_lookback, n))
+        self._count = 0
+        self._pos = 0
+        self._since_seed = 0
+        self._shift = np.zeros(n)
+        self._s = np.zeros(n)
+        self._p = np.zeros((n, n))
+        self._iu = np.triu_indices(n, k=1)
+        self.last: Optional[Dict[str, float]] = None
+
+    @classmethod
+    def load(cls, path: str, prime: bool = True) -> "RegimeScorer":
+        """Scorer from save_scoring_model(); prime=True fills the buffer with the saved returns."""
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        scorer = cls(payload["model"], payload["cfg"], payload["tickers"], payload["feature_names"])
+        if prime:
+            for row in payload["recent_returns"][scorer.tickers].to_numpy(dtype=float):
+                scorer.update(row)
+        return scorer
+
+    def _seed(self) -> None:
+        self._shift = self._buf.mean(axis=0)
+        w = self._buf - self._shift
+        self._s = w.sum(axis=0)
+        self._p = w.T @ w
+        self._since_seed = 0
+
+    def _features(self, C: np.ndarray) -> Dict[str, float]:
+        """corr_features_batch for one matrix; NaN-free fast path, batch version otherwise."""
+        n = C.shape[0]
+        off = C[self._iu]
+        W = np.clip(C, 0.0, 1.0)
+        np.fill_diagonal(W, 0.0)
+        d = W.sum(axis=1)
+        if n < 3 or np.isnan(d).any():
+            return {k: float(v[0]) for k, v in corr_features_batch(C[None]).items()}
+
+        fiedler = 0.0
+        if not np.any(d <= 1e-12):
+            r = 1.0 / np.sqrt(d)
+            L = -(r[:, None] * W * r[None, :])
+            L.flat[:: n + 1] += 1.0
+            fiedler = float(np.linalg.eigvalsh(L)[1])
+        return {"mean_corr": float(off.mean()), "corr_std": float(off.std()), "fiedler": fiedler}
+
+    def predict(self, features: np.ndarray) -> float:
+        """p_risk for one feature vector (same as model.predict_proba(...)[:, 1])."""
+        z = (features - self._mu) / self._scale
+        for w, b in zip(self._coefs[:-1], self._intercepts[:-1]):
+            z = np.maximum(z @ w + b, 0.0)
+        z = z @ self._coefs[-1] + self._intercepts[-1]
+        return float(1.0 / (1.0 + np.exp(-z[0])))
+
+    def exposure(self, p_risk: float) -> float:
+        """Scalar stepwise_exposure."""
+        cfg = self.cfg
+        exp = cfg.exp_ok
+        if p_risk > cfg.gate_lo:
+            exp = cfg.exp_lo
+        if p_risk > cfg.gate_mid:
+            exp = cfg.exp_mid
+        if p_risk > cfg.gate_hi:
+            exp = cfg.exp_hi
+        return exp
+
+    def update(self, ret) -> Optional[Dict[str, float]]:
+        """
+        Push one bar of returns (dict keyed by ticker or array in self.tickers order).
+        Returns {"p_risk", "exposure", features...}, or None while the buffer is still filling.
+        """
+        if isinstance(ret, dict):
+            ret = [ret[t] for t in self.tickers]
+        x = np.asarray(ret, dtype=float)
+        if x.shape != (len(self.tickers),) or np.isnan(x).any():
+            raise ValueError(f"Expected {len(self.tickers)} non-NaN returns ({', '.join(self.tickers)}).")
+
+        L = self.cfg.corr_lookback
+        if self._count < L:
+            self._buf[self._count] = x
+            self._count += 1
+            if self._count < L:
+                return None
+            self._seed()
+        else:
+            old = self._buf[self._pos] - self._shift
+            self._buf[self._pos] = x
+            self._pos = (self._pos + 1) % L
+            self._since_seed += 1
+            if self._since_seed >= self.reseed:
+                self._seed()
+            else:
+                new = x - self._shift
+                self._s += new - old
+                self._p += np.outer(new, new) - np.outer(old, old)
+
+        cov = self._p - np.outer(self._s, self._s) / L
+        sd = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            C = cov / np.outer(sd, sd)
+        C[sd == 0.0, :] = np.nan
+        C[:, sd == 0.0] = np.nan
+        np.fill_diagonal(C, np.where(sd > 0.0, 1.0, np.nan))
+
+        feats = self._features(np.clip(C, -1.0, 1.0))
+        f = np.array([feats[name] for name in self.feature_names])
+        p_risk = self.predict(f)
+
+        out = {name: float(v) for name, v in zip(self.feature_names, f)}
+        out["p_risk"] = p_risk
+        out["exposure"] = self.exposure(p_risk)
+        self.last = out
+        return out
+
+    def replay(self, rets: pd.DataFrame) -> pd.DataFrame:
+        """
+        Feed historical bars in order. Each row is indexed by the day the score applies to
+        (the bar after the window), so it lines up with run_system's p_risk / exposure.
+        """
+        vals = rets[self.tickers].to_numpy(dtype=float)
+        rows, dates = [], []
+        for i in range(len(vals)):
+            out = self.update(vals[i])
+            if out is not None and i + 1 < len(vals):
+                rows.append(out)
+                dates.append(rets.index[i + 1])
+        return pd.DataFrame(rows, index=pd.Index(dates, name="date"))
+
+
+def make_scoring_server(scorer: RegimeScorer, host: str = "127.0.0.1", port: int = 8765) -> HTTPServer:
+    """
+    JSON over HTTP (single-threaded, so bars apply in arrival order):
+      POST /bar     {"returns": {ticker: r, ...}} -> {"p_risk", "exposure", features...}
+      GET  /latest  -> last published score
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Dict[str, object]) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/latest":
+                return self._send(404, {"error": f"unknown path {self.path}"})
+            self._send(200, scorer.last or {})
+
+        def do_POST(self):
+            if self.path != "/bar":
+                return self._send(404, {"error": f"unknown path {self.path}"})
+            try:
+                msg = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                out = scorer.update(msg["returns"])
+            except (KeyError, ValueError, TypeError) as e:
+                return self._send(400, {"error": str(e)})
+            self._send(200, out if out is not None else {"warming_up": True})
+
+        def log_message(self, *args):
+            pass
+
+    return HTTPServer((host, port), Handler)
+
+
+# -----------------------------
+# Gate Surface Explorer
+# -----------------------------
+
+def oos_cache(out: Dict[str, object]) -> pd.DataFrame:
+    """
+    Out-of-sample inputs of the gate from one run_system output: p_risk, the ungated proxy
+    return and the fold id (costs restart at each fold, as in the backtest). Save with .to_pickle().
+    """
+    base = out["base_returns"]
+    cache = pd.DataFrame({"p_risk": out["p_risk"].reindex(base.index), "base_ret": base})
+    cache["fold"] = -1
+    for k, row in enumerate(out["fold_stats"].itertuples()):
+        cache.loc[row.test_start:row.test_end, "fold"] = k
+    return cache
+
+
+def gate_grid(gates=None, exposures=(0.0, 0.25, 0.5, 0.75, 1.0)) -> pd.DataFrame:
+    """Every monotone setting: gate_lo < gate_mid < gate_hi and exp_hi <= exp_mid <= exp_lo <= exp_ok."""
+    gates = np.round(np.arange(0.30, 0.96, 0.05), 2) if gates is None else np.asarray(gates, dtype=float)
+    g = np.array(list(itertools.combinations(sorted(gates), 3)))
+    e = np.array(list(itertools.combinations_with_replacement(sorted(exposures), 4)))
+    gi, ei = np.meshgrid(np.arange(len(g)), np.arange(len(e)), indexing="ij")
+    g, e = g[gi.ravel()], e[ei.ravel()]
+    return pd.DataFrame({
+        "gate_lo": g[:, 0], "gate_mid": g[:, 1], "gate_hi": g[:, 2],
+        "exp_hi": e[:, 0], "exp_mid": e[:, 1], "exp_lo": e[:, 2], "exp_ok": e[:, 3],
+    })
+
+
+def pareto_front(sharpe_: np.ndarray, maxdd: np.ndarray, turnover: np.ndarray) -> np.ndarray:
+    """Mask of settings no other setting beats on Sharpe (max), max drawdown (max) and turnover (min)."""
+    pts = np.column_stack([sharpe_, maxdd, -turnover])
+    uniq, inv = np.unique(pts, axis=0, return_inverse=True)
+
+    # in descending lexicographic order any dominator comes first, and it suffices to
+    # compare against the frontier found so far (dominance is transitive)
+    keep = np.zeros(len(uniq), dtype=bool)
+    front = np.empty((0, 3))
+    for i in np.lexsort((uniq[:, 2], uniq[:, 1], uniq[:, 0]))[::-1]:
+        if not (front >= uniq[i]).all(axis=1).any():
+            keep[i] = True
+            front = np.vstack([front, uniq[i]])
+    return keep[inv.ravel()]
+
+
+def gate_surface(cache: pd.DataFrame, cost_bps: float, grid: Optional[pd.DataFrame] = None,
+                 max_bytes: int = 256 * 2**20) -> pd.DataFrame:
+    """
+    Sharpe / max drawdown / CAGR / annual turnover of every gate setting in `grid` (default
+    gate_grid()) on cached out-of-sample p_risk, plus a `pareto` flag. No retraining: each
+    setting only maps p_risk to an exposure path, and all paths of a chunk go through
+    apply_exposure_and_costs_batch fold by fold. Reproduces run_system's overlay numbers.
+    """
+    grid = gate_grid() if grid is None else grid.reset_index(drop=True)
+    cache = cache[cache["fold"] >= 0]
+    p = cache["p_risk"].to_numpy(dtype=float)
+    r = cache["base_ret"].to_numpy(dtype=float)
+    folds = cache["fold"].to_numpy()
+    cuts = np.flatnonzero(np.diff(folds)) + 1
+    segments = list(zip(np.r_[0, cuts], np.r_[cuts, len(p)]))
+
+    # stepwise_exposure as a lookup: level = number of gates p_risk clears (monotone gates)
+    gates = grid[["gate_lo", "gate_mid", "gate_hi"]].to_numpy()
+    levels = grid[["exp_ok", "exp_lo", "exp_mid", "exp_hi"]].to_numpy()
+    g_uniq, g_inv = np.unique(gates, axis=0, return_inverse=True)
+    g_inv = g_inv.ravel()
+    bucket = (p[None, :, None] > g_uniq[:, None, :]).sum(axis=2)  # (G, T)
+
+    K, T = len(grid), len(p)
+    res = {k: np.empty(K) for k in ("sharpe", "max_drawdown", "cagr", "annual_turnover")}
+    chunk = max(1, int(max_bytes // (3 * 8 * max(T, 1))))
+    for lo in range(0, K, chunk):
+        sl = slice(lo, min(K, lo + chunk))
+        E = np.take_along_axis(levels[sl], bucket[g_inv[sl]], axis=1)
+        net = np.empty_like(E)
+        turn = np.empty_like(E)
+        for a, b in segments:
+            seg = apply_exposure_and_costs_batch(E[:, a:b], r[a:b], cost_bps)
+            net[:, a:b], turn[:, a:b] = seg["net"], seg["turnover"]
+        m = batch_metrics(net, cache.index)
+        res["sharpe"][sl] = m["sharpe"]
+        res["max_drawdown"][sl] = m["max_drawdown"]
+        res["cagr"][sl] = m["cagr"]
+        res["annual_turnover"][sl] = 252 * turn.mean(axis=1)
+
+    surface = grid.assign(**res)
+    surface["pareto"] = pareto_front(surface["sharpe"].values, surface["max_drawdown"].values,
+                                     surface["annual_turnover"].values)
+    return surface
+
+
+def plot_gate_surface(surface: pd.DataFrame, title: str = "Gate Surface (Sharpe vs MaxDD)",
+                      path: Optional[str] = None, max_points: Optional[int] = None):
+    """path => save to that file instead of plt.show() (max_points unused: a scatter, not a series)."""
+    front = surface[surface["pareto"]]
+
+    fig = _new_figure((10, 7), path)
+    ax = fig.add_subplot(1, 1, 1)
+    sc = ax.scatter(surface["max_drawdown"], surface["sharpe"], c=surface["annual_turnover"], s=4, alpha=0.4)
+    ax.scatter(front["max_drawdown"], front["sharpe"], s=14, color="red", label="Pareto frontier")
+    fig.colorbar(sc, ax=ax, label="Annual turnover")
+    ax.set_title(title)
+    ax.set_xlabel("Max Drawdown"); ax.set_ylabel("Sharpe")
+    ax.legend()
+
+    _finish_figure(fig, path)
+
+
 # -----------------------------
 # Plotting
 # -----------------------------
 
-def plot_performance(out: Dict[str, object], title: str = "Short-Vol Proxy: Base vs NN Overlay"):
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of a Largest-Triangle-Three-Buckets downsample of (x, y) to n_out points.
+    Keeps the first and last point and, per bucket, the point spanning the largest
+    triangle with the previous pick and the next bucket's mean (peaks and troughs survive).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)   # n_out - 2 buckets between the ends
+    cnt = np.diff(edges)
+    mx = np.add.reduceat(x[:-1], edges[:-1]) / cnt
+    my = np.add.reduceat(y[:-1], edges[:-1]) / cnt
+    mx = np.r_[mx[1:], x[-1]]
+    my = np.r_[my[1:], y[-1]]
+
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((x[a] - mx[b]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (my[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[b + 1] = a
+    return idx
+
+
+def _thin(s: pd.Series, max_points: Optional[int]) -> pd.Series:
+    """LTTB-downsampled copy of a (NaN-free) series; unchanged if short or max_points is None."""
+    s = s.dropna()
+    if max_points is None or len(s) <= max_points:
+        return s
+    x = s.index.asi8 if isinstance(s.index, pd.DatetimeIndex) else np.arange(len(s))
+    return s.iloc[lttb(x, s.to_numpy(dtype=float), max_points)]
+
+
+def _new_figure(figsize, path: Optional[str]):
+    # saved figures never touch pyplot, so they render headless under any backend
+    return plt.figure(figsize=figsize) if path is None else Figure(figsize=figsize)
+
+
+def _finish_figure(fig, path: Optional[str], dpi: int = 120) -> None:
+    fig.tight_layout()
+    if path is None:
+        plt.show()
+    else:
+        fig.savefig(path, dpi=dpi)
+
+
+def plot_performance(out: Dict[str, object], title: str = "Short-Vol Proxy: Base vs NN Overlay",
+                     path: Optional[str] = None, max_points: Optional[int] = None):
+    """path => save to that file (png/svg/... by extension) instead of plt.show(); max_points => LTTB-downsample lines."""
     base = out["base_returns"].dropna()
     overlay = out["overlay_returns"].dropna()
     eq_b = out["base_equity"].dropna()
@@ -412,15 +1422,16 @@ def plot_performance(out: Dict[str, object], title: str = "Short-Vol Proxy: Base
     dd_o = eq_o / eq_o.cummax() - 1
 
     win = 252
-    def rolling_sharpe(r: pd.Series) -> pd.Series:
-        m = r.rolling(win).mean()
-        s = r.rolling(win).std()
-        return np.sqrt(252) * (m / s)
+    rs_b = pd.Series(rolling_metrics(base.to_numpy()[None], win)["sharpe"][0], index=base.index)
+    rs_o = pd.Series(rolling_metrics(overlay.to_numpy()[None], win)["sharpe"][0], index=overlay.index)
 
-    rs_b = rolling_sharpe(base)
-    rs_o = rolling_sharpe(overlay)
+    # Downsample lines (full data still feeds the histogram)
+    log_b, log_o = _thin(np.log(eq_b), max_points), _thin(np.log(eq_o), max_points)
+    eq_b, eq_o = _thin(eq_b, max_points), _thin(eq_o, max_points)
+    dd_b, dd_o = _thin(dd_b, max_points), _thin(dd_o, max_points)
+    rs_b, rs_o = _thin(rs_b, max_points), _thin(rs_o, max_points)
 
-    fig = plt.figure(figsize=(14, 12))
+    fig = _new_figure((14, 12), path)
     fig.suptitle(title)
 
     ax1 = fig.add_subplot(3, 2, 1)
@@ -431,8 +1442,8 @@ def plot_performance(out: Dict[str, object], title: str = "Short-Vol Proxy: Base
     ax1.legend()
 
     ax2 = fig.add_subplot(3, 2, 2)
-    ax2.plot(eq_b.index, np.log(eq_b.values), label="Base")
-    ax2.plot(eq_o.index, np.log(eq_o.values), label="Overlay")
+    ax2.plot(log_b.index, log_b.values, label="Base")
+    ax2.plot(log_o.index, log_o.values, label="Overlay")
     ax2.set_title("Equity (Log)")
     ax2.set_xlabel("Date"); ax2.set_ylabel("log(Equity)")
     ax2.legend()
@@ -461,22 +1472,23 @@ def plot_performance(out: Dict[str, object], title: str = "Short-Vol Proxy: Base
     ax5.legend()
 
     ax6 = fig.add_subplot(3, 2, 6)
-    ax6.plot((1 + base).cumprod().index, (1 + base).cumprod().values, label="Base")
-    ax6.plot((1 + overlay).cumprod().index, (1 + overlay).cumprod().values, label="Overlay")
+    ax6.plot(eq_b.index, eq_b.values, label="Base")
+    ax6.plot(eq_o.index, eq_o.values, label="Overlay")
     ax6.set_title("Equity (Redundant Check)")
     ax6.set_xlabel("Date"); ax6.set_ylabel("Equity")
     ax6.legend()
 
-    plt.tight_layout()
-    plt.show()
+    _finish_figure(fig, path)
 
 
-def plot_regime_diagnostics(out: Dict[str, object], title: str = "Regime Diagnostics"):
-    p_risk = out["p_risk"].dropna()
-    exposure = out["exposure"].dropna()
+def plot_regime_diagnostics(out: Dict[str, object], title: str = "Regime Diagnostics",
+                            path: Optional[str] = None, max_points: Optional[int] = None):
+    """path / max_points as in plot_performance."""
+    p_risk = _thin(out["p_risk"], max_points)
+    exposure = _thin(out["exposure"], max_points)
     X = out["features"].dropna()
 
-    fig = plt.figure(figsize=(14, 10))
+    fig = _new_figure((14, 10), path)
     fig.suptitle(title)
 
     ax1 = fig.add_subplot(3, 1, 1)
@@ -494,13 +1506,36 @@ def plot_regime_diagnostics(out: Dict[str, object], title: str = "Regime Diagnos
     ax3 = fig.add_subplot(3, 1, 3)
     for col in ["mean_corr", "corr_std", "fiedler"]:
         if col in X.columns:
-            ax3.plot(X.index, X[col].values, label=col)
+            f = _thin(X[col], max_points)
+            ax3.plot(f.index, f.values, label=col)
     ax3.legend()
     ax3.set_title("Structure Features Over Time")
     ax3.set_xlabel("Date"); ax3.set_ylabel("Value")
 
-    plt.tight_layout()
-    plt.show()
+    _finish_figure(fig, path)
+
+
+def _render_job(job) -> str:
+    plot_fn, out, title, path, max_points = job
+    plot_fn(out, title, path=path, max_points=max_points)
+    return path
+
+
+def render_reports(jobs: List[Tuple[object, Dict[str, object], str, str]], n_jobs: Optional[int] = None,
+                   max_points: Optional[int] = 2000) -> List[str]:
+    """
+    Headless batch rendering: jobs are (plot_fn, out, title, path) for plot_performance /
+    plot_regime_diagnostics / plot_gate_surface, one figure file each, spread over processes (n_jobs=1 => in-process).
+    Returns the written paths.
+    """
+    for *_, path in jobs:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tasks = [(fn, out, title, path, max_points) for fn, out, title, path in jobs]
+
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [_render_job(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=n_jobs) as ex:
+        return list(ex.map(_render_job, tasks))
 
 
 # -----------------------------
@@ -543,5 +1578,32 @@ if __name__ == "__main__":
         print("\n=== Fold-by-fold stats ===")
         print(fs.to_string(index=False))
 
-    plot_performance(out, "Short-Vol Proxy: Base vs Topology+NN Overlay")
-    plot_regime_diagnostics(out, "NN Risk + Step Exposure + Structure Features")
\ No newline at end of file
+    # Set True to rerun with cold- vs warm-start training and compare out-of-sample, fold by fold
+    compare_training = False
+    if compare_training:
+        print("\n=== Cold vs warm-start training ===")
+        print(compare_warm_start(cfg).to_string(index=False))
+
+    # Set True to sweep gate/exposure settings on this run's out-of-sample p_risk (no retraining)
+    explore_gates = False
+    if explore_gates:
+        surface = gate_surface(oos_cache(out), cfg.cost_bps)
+        print("\n=== Gate surface: Pareto frontier ===")
+        print(surface[surface["pareto"]].sort_values("sharpe", ascending=False).head(20).to_string(index=False))
+        plot_gate_surface(surface)
+
+    # Online scoring: run with cfg.model_path set, then in a long-lived process
+    #   scorer = RegimeScorer.load(cfg.model_path)
+    #   make_scoring_server(scorer).serve_forever()
+
+    # Set a directory to write PNG/SVG figures headless (downsampled, parallel) instead of showing them
+    report_dir = None
+    if report_dir is None:
+        plot_performance(out, "Short-Vol Proxy: Base vs Topology+NN Overlay")
+        plot_regime_diagnostics(out, "NN Risk + Step Exposure + Structure Features")
+    else:
+        paths = render_reports([
+            (plot_performance, out, "Short-Vol Proxy: Base vs Topology+NN Overlay", os.path.join(report_dir, "performance.png")),
+            (plot_regime_diagnostics, out, "NN Risk + Step Exposure + Structure Features", os.path.join(report_dir, "regime_diagnostics.png")),
+        ])
+        print("\nSaved: " + ", ".join(paths))
\ No newline at end of file